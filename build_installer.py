@@ -12,6 +12,7 @@ Download packages only!
 
 import os
 import sys
+import time
 import argparse
 import zipfile
 
@@ -47,6 +48,8 @@ VERSION_STR = "1.2.0"
 
 ADOBE_DL_HEADERS = {"User-Agent": "Creative Cloud"}
 
+BLOCK_SIZE = 1024 * 1024  # 1 Megabyte
+
 ACC_URL = "https://ccmdls.adobe.com/AdobeProducts/StandaloneBuilds/ACCC/ESD/{mainVer}/{buildVer}/{platform}/{fileName}"
 
 CURR_PATH = os.path.dirname(os.path.realpath(__name__))
@@ -95,11 +98,73 @@ def get_version():
     return version
 
 
+def speed_limit() -> int:
+    """Get speed limit in bytes per second for current time"""
+    if not args.limit:
+        return 0
+
+    if args.limitHours:
+        start, end = [int(h.split(":")[0]) % 24 for h in args.limitHours.split("-")]
+        hour = time.localtime().tm_hour
+        if start <= end and not start <= hour < end:
+            return 0
+        if start > end and end <= hour < start:
+            return 0
+
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = args.limit.strip().upper().rstrip("/S").rstrip("B")
+    mult = 1
+    if value and value[-1] in units:
+        mult = units[value[-1]]
+        value = value[:-1]
+    return int(float(value) * mult)
+
+
+def read_body(response, buf):
+    """Yield response body read into reusable buffer"""
+    if response.headers.get("content-encoding", "identity").lower() not in ("", "identity"):
+        # compressed body is decoded by requests
+        yield from response.iter_content(len(buf))
+        return
+
+    # socket file fills the buffer itself, urllib3 readinto copies a new bytes
+    readinto = response.raw._fp.readinto
+    view = memoryview(buf)
+    while size := readinto(buf):
+        yield view[:size]
+
+
 def do_download(dFile, url):
+    # unfinished download, renamed to destination when completed
+    partFile = dFile + ".part"
     try:
-        # get file size
-        response = session.head(url, stream=False, headers=ADOBE_DL_HEADERS)
-        lengthInBytes = int(response.headers.get("content-length", 0))
+        # resume from the end of unfinished download
+        offset = 0
+        if os.path.isfile(partFile):
+            offset = os.path.getsize(partFile)
+
+        headers = ADOBE_DL_HEADERS.copy()
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+
+        # download file, size comes with the response
+        response = session.get(url, stream=True, headers=headers)
+        if response.status_code == 416:
+            # part file is not smaller than the file
+            response.close()
+            offset = 0
+            response = session.get(url, stream=True, headers=ADOBE_DL_HEADERS)
+        response.raise_for_status()
+
+        mode = "ab"
+        if response.status_code != 206:
+            # server sent the whole file
+            offset = 0
+            mode = "wb"
+        elif offset:
+            print(f"\nResuming download from {offset} bytes")
+
+        lengthInBytes = offset + int(response.headers.get("content-length", 0))
 
         if lengthInBytes < 2048:
             sys.exit(
@@ -109,18 +174,31 @@ def do_download(dFile, url):
             os.path.isfile(dFile)
             and os.path.getsize(dFile) == lengthInBytes
         ):
+            response.close()
             print(f"\nDownloaded file seems OK, skipping...")
             return
 
-        # download file
-        response = session.get(url, stream=True, headers=ADOBE_DL_HEADERS)
-
-        blockSize = 1024  # 1 Kilobyte
-        with tqdm(total=lengthInBytes, unit="iB", unit_scale=True) as pBar:
-            with open(dFile, "wb") as file:
-                for data in response.iter_content(blockSize):
-                    pBar.update(len(data))
+        rate = speed_limit()
+        buf = bytearray(min(BLOCK_SIZE, max(16 * 1024, rate // 4))
+                        if rate else BLOCK_SIZE)
+        start = time.monotonic()
+        received = 0
+        with tqdm(total=lengthInBytes, initial=offset, unit="iB", unit_scale=True) as pBar:
+            with open(partFile, mode) as file:
+                for data in read_body(response, buf):
                     file.write(data)
+                    pBar.update(len(data))
+                    received += len(data)
+                    if rate:
+                        # wait until average speed is under limit
+                        delay = received / rate - (time.monotonic() - start)
+                        if delay > 0:
+                            time.sleep(delay)
+
+        if os.path.getsize(partFile) != lengthInBytes:
+            sys.exit("\nDownload is incomplete! Run again to resume.")
+
+        os.replace(partFile, dFile)
     except Exception as e:
         print(e)
         sys.exit("\nCannot download file!")
@@ -163,6 +241,12 @@ if __name__ == "__main__":
     parser.add_argument(
         "-p", "--platform", help="ACCC platform", action="store"
     )
+    parser.add_argument(
+        "--limit", help="Download speed limit in bytes per second (eg. 10M)", action="store"
+    )
+    parser.add_argument(
+        "--limitHours", help="Hours of day when speed limit is used (eg. 8-18)", action="store"
+    )
     args = parser.parse_args()
 
     show_info(SCRIPT_NAME, VERSION_STR, 6, '=')
@@ -16,8 +16,24 @@ import locale
 import ctypes
 import sys
 import operator
-from pathlib import Path
+import re
+import sqlite3
+import hashlib
+import shutil
+import asyncio
+import queue
+import threading
+import time
+import subprocess
+import contextvars
+import atexit
+import cProfile
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from collections import OrderedDict
+from functools import lru_cache
+from contextlib import closing, contextmanager
 from xml.etree import ElementTree as ET
 
 try:
@@ -38,9 +54,21 @@ except ImportError:
         or run: pip3 install tqdm."""
     )
 
+# optional, only needed by asyncio engine
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# optional, only needed by toml job files
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
 
 SCRIPT_NAME = "Adobe CC Packages Downloader For Windows"
-VERSION_STR = "1.2.1"
+VERSION_STR = "1.3.0"
 CODE_QUALITY = "Really_AWFUL"
 
 ADOBE_PRODUCTS_XML_URL = "https://prod-rel-ffc-ccm.oobesaas.adobe.com/adobe-ffc-external/core/v{urlVersion}/products/all?channel=ccm&channel=sti&platform={reqPlatforms}&productType=Desktop&_type=xml"
@@ -58,7 +86,71 @@ ADOBE_REQ_HEADERS = {
 
 ADOBE_DL_HEADERS = {"User-Agent": "Creative Cloud"}
 
+# build guids of downloaded products, used by mirror mode
+MIRROR_INDEX = "mirror.json"
+
+# Application.json files downloaded at the same time
+METADATA_JOBS = 8
+
+# indexed products list, kept in cache directory
+CATALOG_DB = "catalog.db"
+
+# job file keys with other names than arguments
+JOB_KEYS = {
+    "products": "sapCode",
+    "languages": "installLanguage",
+    "platform": "appPlatform",
+    "targets": "target",
+}
+
+# download plans of this run, store keys of planned packages
+planReports = []
+planKeys = set()
+
+# buffers in flight between network reads and disk writes
+WRITE_BUFFERS = 4
+
+# Application.json fields that may carry a package digest
+PACKAGE_DIGEST_KEYS = ("PackageHash", "packageHashKey", "Hash")
+# digest algorithm by hex digest length
+DIGEST_ALGORITHMS = {32: "md5", 40: "sha1", 64: "sha256"}
+
 session = requests.sessions.Session()
+session.hooks["response"].append(
+    lambda r, *args, **kwargs: record_request(r.url, r.elapsed.total_seconds(), r.status_code))
+
+# event loop and http session of asyncio engine
+eventLoop = None
+aioSession = None
+
+# token buckets of bandwidth limiter, "*" is shared by all hosts
+rateLock = threading.Lock()
+rateBuckets = {}
+
+# one download at a time for each package in shared store
+storeLock = threading.Lock()
+storeKeyLocks = {}
+
+# transfer metrics, package of current thread or asyncio task
+metricsLock = threading.Lock()
+metrics = {
+    "started": time.time(),
+    "networkBytes": 0,
+    "cacheBytes": 0,
+    "counters": {},
+    "hosts": {},
+    "products": {},
+}
+transferVar = contextvars.ContextVar("transfer", default=None)
+# progress bar of whole batch
+totalBar = None
+
+# trace events and profiler, None when not requested
+TRACE_START = time.perf_counter()
+traceLock = threading.Lock()
+traceEvents = None
+profiler = None
+profileDepth = 0
 
 
 def show_info(name: str, version: str, pad: int, bdr: str) -> None:
@@ -79,7 +171,7 @@ def get_arguments() -> argparse.Namespace:
         "-o", "--osLanguage", help="OS Language code (eg. en_US)", action="store"
     )
     parser.add_argument(
-        "-p", "--appPlatform", help="Application platform (eg. win64)", action="store"
+        "-p", "--appPlatform", help="Application platform (eg. win64). For more than one platform use comma to separate platforms", action="store"
     )
     parser.add_argument(
         "-s",
@@ -102,7 +194,7 @@ def get_arguments() -> argparse.Namespace:
     parser.add_argument(
         "-u",
         "--urlVersion",
-        help="Get app info from v4/v5/v6 url (eg. v6)",
+        help="Get app info from v4/v5/v6 url (eg. v6). For more than one url version use comma to separate versions",
         action="store",
     )
     parser.add_argument(
@@ -129,6 +221,176 @@ def get_arguments() -> argparse.Namespace:
         help="Skip existing files, e.g. resuming failed downloads",
         action="store_true",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of packages to download at the same time (eg. 4)",
+        type=int,
+        default=1,
+        action="store",
+    )
+    parser.add_argument(
+        "--segments",
+        help="Number of connections used for one large package (eg. 4)",
+        type=int,
+        default=1,
+        action="store",
+    )
+    parser.add_argument(
+        "--segmentSize",
+        help="Minimum package size in MB for segmented downloads (eg. 64)",
+        type=int,
+        default=64,
+        action="store",
+    )
+    parser.add_argument(
+        "--chunkSize",
+        help="Network read and disk write size in KB (eg. 1024)",
+        type=int,
+        default=1024,
+        action="store",
+    )
+    parser.add_argument(
+        "--retries",
+        help="Number of retries for failed or corrupted packages (eg. 2)",
+        type=int,
+        default=2,
+        action="store",
+    )
+    parser.add_argument(
+        "--store",
+        help="Shared package store, products are hardlinked from it (eg. D:\\adobe-store)",
+        action="store",
+    )
+    parser.add_argument(
+        "--limit",
+        help="Download speed limit for all downloads in bytes per second (eg. 10M)",
+        action="store",
+    )
+    parser.add_argument(
+        "--hostLimit",
+        help="Download speed limit for each host in bytes per second (eg. 5M)",
+        action="store",
+    )
+    parser.add_argument(
+        "--limitHours",
+        help="Hours of day when speed limits are used, full speed at other times (eg. 8-18)",
+        action="store",
+    )
+    parser.add_argument(
+        "--cacheDir",
+        help="Directory for cached products list and Application.json files (eg. D:\\adobe-cache)",
+        action="store",
+    )
+    parser.add_argument(
+        "--catalogTtl",
+        help="Seconds to use cached products list without checking for changes (eg. 3600)",
+        type=int,
+        default=3600,
+        action="store",
+    )
+    parser.add_argument(
+        "--target",
+        help="Build target as LANGUAGES[:OSVERSION[:PLATFORM]], use more than once to share packages between targets (eg. de_DE,fr_FR:10.0.17763)",
+        action="append",
+    )
+    parser.add_argument(
+        "--plan",
+        help="Show download, extract and already downloaded sizes without downloading packages",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--planJson",
+        help="Save download plan to json file, - for console (eg. plan.json)",
+        action="store",
+    )
+    parser.add_argument(
+        "--acrobat",
+        help="Acrobat download without prompt: full, or base version or file name of update package",
+        action="store",
+    )
+    parser.add_argument(
+        "--job",
+        help="Run jobs from json or toml job file without prompts (eg. jobs.json)",
+        action="store",
+    )
+    parser.add_argument(
+        "--jobIndex",
+        help=argparse.SUPPRESS,
+        type=int,
+        action="store",
+    )
+    parser.add_argument(
+        "--progress",
+        help="Progress bar for every file, total of all files or none (eg. total)",
+        choices=["file", "total", "none"],
+        default="file",
+        action="store",
+    )
+    parser.add_argument(
+        "--metrics",
+        help="Append transfer metrics as json lines to file (eg. metrics.jsonl)",
+        action="store",
+    )
+    parser.add_argument(
+        "--promFile",
+        help="Write transfer metrics to Prometheus text file (eg. ccdl.prom)",
+        action="store",
+    )
+    parser.add_argument(
+        "--metricsInterval",
+        help="Seconds between metrics updates (eg. 10)",
+        type=float,
+        default=10,
+        action="store",
+    )
+    parser.add_argument(
+        "--trace",
+        help="Save time of every phase and package download as Chrome trace file, open with chrome://tracing or speedscope (eg. trace.json)",
+        action="store",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Save cProfile data of products list parsing, filtering and dependencies (eg. ccdl.prof)",
+        action="store",
+    )
+    parser.add_argument(
+        "--appJsonCache",
+        help="Maximum size in MB of cached Application.json files, 0 to disable (eg. 64)",
+        type=int,
+        default=64,
+        action="store",
+    )
+    parser.add_argument(
+        "--query",
+        help="Show products, versions, languages or latest versions from saved products list, filtered by -s, -v, -p and -u",
+        choices=["products", "versions", "languages", "latest"],
+        action="store",
+    )
+    parser.add_argument(
+        "--serve",
+        help="Serve downloaded products as mirror on port (eg. 8080)",
+        type=int,
+        action="store",
+    )
+    parser.add_argument(
+        "--bind",
+        help="Address of mirror server (eg. 0.0.0.0)",
+        default="0.0.0.0",
+        action="store",
+    )
+    parser.add_argument(
+        "--mirror",
+        help="Get catalog, Application.json and packages from mirror (eg. http://buildhost:8080)",
+        action="store",
+    )
+    parser.add_argument(
+        "--engine",
+        help="Download engine, asyncio needs aiohttp module (eg. asyncio)",
+        choices=["requests", "asyncio"],
+        default="requests",
+        action="store",
+    )
     return parser.parse_args()
 
 
@@ -145,20 +407,32 @@ def get_winver() -> str:
     return "{}.{}.{}".format(winVer.major, winVer.minor, winVer.build)
 
 
-def set_url_version(args: argparse.Namespace) -> str:
-    """Set url version for downloading ffc.xml"""
+def split_list(value: str, accept: list[str]) -> list[str] | None:
+    """Split comma separated values, None if any value is not accepted"""
+    values = []
+    for v in value.split(","):
+        v = v.strip()
+        if v not in accept:
+            return None
+        if v not in values:
+            values.append(v)
+    return values
+
+
+def set_url_version(args: argparse.Namespace) -> list[str]:
+    """Set url versions for downloading ffc.xml"""
     urlVersion = None
     acceptVers = ["v4", "v5", "v6", "4", "5", "6"]
 
     if args.urlVersion:
-        if args.urlVersion.lower() in acceptVers:
-            urlVersion = args.urlVersion[-1]
-            print(f"\nUsing provided url version: {urlVersion}")
+        urlVersion = split_list(args.urlVersion.lower(), acceptVers)
+        if urlVersion:
+            urlVersion = list(dict.fromkeys(v[-1] for v in urlVersion))
+            print("\nUsing provided url version: {}".format(", ".join(urlVersion)))
         else:
             print(
                 f'Invalid argument "{args.urlVersion}" for URL version! Please select from version list below\n'
             )
-            urlVersion = None
 
     while not urlVersion:
         versions = {
@@ -176,16 +450,17 @@ def set_url_version(args: argparse.Namespace) -> str:
             )
             or "v6"
         )
-        if usrInput in acceptVers:
-            urlVersion = usrInput[-1]
+        urlVersion = split_list(usrInput, acceptVers)
+        if urlVersion:
+            urlVersion = list(dict.fromkeys(v[-1] for v in urlVersion))
         else:
             print(f"Invalid URL version: {usrInput}")
 
     return urlVersion
 
 
-def set_app_platform(args: argparse.Namespace) -> str:
-    """Set application platform"""
+def set_app_platform(args: argparse.Namespace) -> list[str]:
+    """Set application platforms"""
     winPlatforms = {
         "win32": "32 Bit Windows",
         "win64": "64 Bit Windows",
@@ -193,14 +468,13 @@ def set_app_platform(args: argparse.Namespace) -> str:
     }
     appPlatform = None
     if args.appPlatform:
-        if args.appPlatform in winPlatforms:
-            appPlatform = args.appPlatform
-            print(f"\nUsing provided windows platform: {appPlatform}")
+        appPlatform = split_list(args.appPlatform, list(winPlatforms))
+        if appPlatform:
+            print("\nUsing provided windows platform: {}".format(", ".join(appPlatform)))
         else:
             print(
                 f"Invalid windows platform [{args.appPlatform}]! Please select form list below\n"
             )
-            appPlatform = None
 
     while not appPlatform:
         print("Available Platforms")
@@ -213,39 +487,30 @@ def set_app_platform(args: argparse.Namespace) -> str:
             )
             or "win64"
         )
-        if val in winPlatforms:
-            appPlatform = val
-        else:
+        appPlatform = split_list(val, list(winPlatforms))
+        if not appPlatform:
             print(f"Invalid platform: {val}\n")
 
     return appPlatform
 
 
-def set_config() -> dict:
+def set_config(args: argparse.Namespace) -> dict:
     """Set configuration data from arguments"""
-    # get arguments
-    args = get_arguments()
+    if args.mirror:
+        use_mirror(args.mirror)
 
-    reqUrlVer = set_url_version(args)
-    reqAppPlatform = set_app_platform(args)
-    print(
-        f"\nPrepare to download {reqAppPlatform} products form url version {reqUrlVer}")
+    reqUrlVers = set_url_version(args)
+    reqAppPlatforms = set_app_platform(args)
+    print("\nPrepare to download {} products form url version {}".format(
+        ", ".join(reqAppPlatforms), ", ".join(reqUrlVers)))
 
     if args.Auth:
         ADOBE_REQ_HEADERS["Authorization"] = args.Auth
 
-    allowedPlatforms = [reqAppPlatform]
-    urlPlatforms = reqAppPlatform
-    if reqAppPlatform == "win64":
-        allowedPlatforms.append("win32")
-        urlPlatforms += ",win32"
-
     # destination dir
     if args.destination:
         print(f"\nUsing provided destination: {args.destination}")
-        dest = args.destination
-    else:
-        dest = os.path.dirname(os.path.realpath(__name__))
+    dest = base_dir(args)
 
     # create products directory
     prodDir = os.path.join(dest, "products")
@@ -256,12 +521,61 @@ def set_config() -> dict:
         f"\nSet windows version to {winver}. You may not install or run products on Windows version below: {winver}!")
 
     print(f"\nDownloaded files will be saved in: {prodDir}")
-
-    return {
-        "reqUrlVer": reqUrlVer,
-        'urlPlatforms': urlPlatforms,
-        "reqAppPlatform": reqAppPlatform,
-        "allowedPlatforms": allowedPlatforms,
+    if len(reqAppPlatforms) > 1:
+        print("Each platform is saved in its own folder: {}".format(
+            ", ".join(reqAppPlatforms)))
+    if len(reqUrlVers) > 1:
+        print("Each url version is saved in its own folder: {}".format(
+            ", ".join(f"v{u}" for u in reqUrlVers)))
+
+    limit = parse_rate(args.limit)
+    hostLimit = parse_rate(args.hostLimit)
+    limitHours = parse_hours(args.limitHours)
+    if limit or hostLimit:
+        hours = "all day"
+        if limitHours:
+            hours = "from {}:00 to {}:00".format(*limitHours)
+        print(
+            f"\nDownload speed limited to {args.limit or 'unlimited'} (host: {args.hostLimit or 'unlimited'}) {hours}")
+
+    cacheDir = cache_dir(args)
+    os.makedirs(cacheDir, exist_ok=True)
+
+    storeDir = None
+    if args.store:
+        storeDir = os.path.realpath(args.store)
+        os.makedirs(storeDir, exist_ok=True)
+        print(f"\nPackages are stored once in: {storeDir}")
+
+    jobs = max(1, args.jobs)
+    if jobs > 1:
+        print(f"\nDownloading {jobs} packages at the same time")
+
+    if args.engine == "asyncio":
+        if aiohttp is None:
+            sys.exit(
+                """You need aiohttp module for asyncio engine!
+        install it from https://pypi.org/project/aiohttp/
+        or run: pip3 install aiohttp."""
+            )
+        print(f"\nUsing asyncio engine with {jobs} connections")
+
+    segments = max(1, args.segments)
+    if segments > 1:
+        print(
+            f"\nPackages larger than {args.segmentSize} MB are downloaded with {segments} connections")
+
+    if jobs * segments > 1:
+        # keep a pooled connection for every worker
+        poolSize = max(jobs * segments, METADATA_JOBS)
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=poolSize, pool_maxsize=poolSize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+    config = {
+        "origins": [(u, p) for p in reqAppPlatforms for u in reqUrlVers],
+        "baseDir": prodDir,
         "downIcons": args.productIcons,
         "noRepeat": args.noRepeatPrompt,
         "osLang": args.osLanguage,
@@ -270,14 +584,316 @@ def set_config() -> dict:
         "reqVer": args.version,
         "productDir": prodDir,
         "skip": args.skipExisting,
-        "osVersion": winver
+        "osVersion": winver,
+        "jobs": jobs,
+        "segments": segments,
+        "segmentMin": args.segmentSize * 1024 * 1024,
+        "chunkSize": max(1, args.chunkSize) * 1024,
+        "engine": args.engine,
+        "store": storeDir,
+        "retries": max(0, args.retries),
+        "limit": limit,
+        "hostLimit": hostLimit,
+        "limitHours": limitHours,
+        "cacheDir": cacheDir,
+        "catalogTtl": args.catalogTtl,
+        "appJsonCache": max(0, args.appJsonCache) * 1024 * 1024,
+        "targets": parse_targets(args.target),
+        "plan": args.plan or bool(args.planJson),
+        "headless": bool(args.job),
+        "progress": args.progress,
+        "metrics": args.metrics,
+        "promFile": args.promFile,
+        "metricsInterval": max(1, args.metricsInterval),
+        "acrobat": args.acrobat,
+    }
+
+    return origin_config(config, *config["origins"][0])
+
+
+def parse_targets(specs: list[str] | None) -> list[dict]:
+    """Convert target arguments (eg. de_DE,fr_FR:10.0.17763:win64) to targets"""
+    targets = []
+    for spec in specs or []:
+        langs, osVersion, platform = (spec.split(":") + ["", ""])[:3]
+        langs = [l.strip() for l in langs.split(",") if l.strip()]
+        if not langs:
+            sys.exit(f"\nTarget {spec} has no language!")
+        if osVersion and not re.fullmatch(r"\d+(\.\d+)*", osVersion):
+            sys.exit(f"\nInvalid windows version {osVersion} for target {spec}!")
+        if platform and platform not in ("win32", "win64", "winarm64"):
+            sys.exit(f"\nInvalid windows platform {platform} for target {spec}!")
+
+        name = "+".join(langs)
+        if osVersion:
+            name += "@" + osVersion
+        targets.append({
+            "name": name,
+            "langs": langs,
+            "osVersion": osVersion or None,
+            "platform": platform or None,
+        })
+
+    if targets:
+        print("\nBuilding targets: {}".format(
+            ", ".join(t["name"] + (f" ({t['platform']})" if t["platform"] else "") for t in targets)))
+
+    return targets
+
+
+def origin_name(urlVer: str, appPlatform: str) -> str:
+    """Name of products list for url version and platform"""
+    return f"v{urlVer}/{appPlatform}"
+
+
+def origin_config(config: dict, urlVer: str, appPlatform: str) -> dict:
+    """Get configuration for one url version and platform"""
+    allowedPlatforms = [appPlatform]
+    urlPlatforms = appPlatform
+    if appPlatform == "win64":
+        allowedPlatforms.append("win32")
+        urlPlatforms += ",win32"
+
+    # every platform and url version in its own folder when there are more
+    prodDir = config["baseDir"]
+    if len({p for _, p in config["origins"]}) > 1:
+        prodDir = os.path.join(prodDir, appPlatform)
+    if len({u for u, _ in config["origins"]}) > 1:
+        prodDir = os.path.join(prodDir, f"v{urlVer}")
+    os.makedirs(prodDir, exist_ok=True)
+
+    return dict(
+        config,
+        origin=origin_name(urlVer, appPlatform),
+        reqUrlVer=urlVer,
+        urlPlatforms=urlPlatforms,
+        reqAppPlatform=appPlatform,
+        allowedPlatforms=allowedPlatforms,
+        productDir=prodDir,
+    )
+
+
+def parse_rate(rate: str | None) -> int:
+    """Convert speed limit (eg. 500K, 10M) to bytes per second"""
+    if not rate:
+        return 0
+
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = rate.strip().upper().rstrip("/S").rstrip("B")
+    mult = 1
+    if value and value[-1] in units:
+        mult = units[value[-1]]
+        value = value[:-1]
+
+    try:
+        return int(float(value) * mult)
+    except ValueError:
+        sys.exit(f"Invalid speed limit: {rate}")
+
+
+def parse_hours(hours: str | None) -> tuple[int, int] | None:
+    """Convert hours range (eg. 8-18) to start and end hour"""
+    if not hours:
+        return None
+
+    try:
+        start, end = [int(h.split(":")[0]) for h in hours.split("-")]
+    except ValueError:
+        sys.exit(f"Invalid hours: {hours}")
+
+    return start % 24, end % 24
+
+
+def limit_active() -> bool:
+    """Check speed limits are used at current time"""
+    if not cfg["limit"] and not cfg["hostLimit"]:
+        return False
+    if not cfg["limitHours"]:
+        return True
+
+    start, end = cfg["limitHours"]
+    hour = time.localtime().tm_hour
+    if start <= end:
+        return start <= hour < end
+    # range over midnight
+    return hour >= start or hour < end
+
+
+def read_size() -> int:
+    """Get network read size, smaller reads keep limited speed smooth"""
+    size = cfg["chunkSize"]
+    if limit_active():
+        rate = min(r for r in (cfg["limit"], cfg["hostLimit"]) if r)
+        size = min(size, max(16 * 1024, rate // 4))
+    return size
+
+
+def throttle_delay(size: int, url: str) -> float:
+    """Take bytes from token buckets, return seconds to wait"""
+    if not limit_active():
+        return 0
+
+    now = time.monotonic()
+    delay = 0
+    with rateLock:
+        for key, rate in (("*", cfg["limit"]), (urlsplit(url).netloc, cfg["hostLimit"])):
+            if not rate:
+                continue
+            bucket = rateBuckets.setdefault(key, {"tokens": rate, "time": now})
+            # refill, burst up to one second of traffic
+            bucket["tokens"] = min(
+                rate, bucket["tokens"] + (now - bucket["time"]) * rate)
+            bucket["time"] = now
+            # reserve bytes, concurrent readers queue behind each other
+            bucket["tokens"] -= size
+            if bucket["tokens"] < 0:
+                delay = max(delay, -bucket["tokens"] / rate)
+
+    return delay
+
+
+def throttle(size: int, url: str) -> None:
+    """Wait until bytes fit into speed limit"""
+    delay = throttle_delay(size, url)
+    if delay:
+        time.sleep(delay)
+
+
+def base_dir(args: argparse.Namespace) -> str:
+    """Get directory for products and cache"""
+    return args.destination or os.path.dirname(os.path.realpath(__name__))
+
+
+def cache_dir(args: argparse.Namespace) -> str:
+    """Get directory for cached data"""
+    return args.cacheDir or os.path.join(base_dir(args), "cache")
+
+
+def use_mirror(mirror: str) -> None:
+    """Replace Adobe servers with mirror server"""
+    global ADOBE_PRODUCTS_XML_URL, ADOBE_APPLICATION_JSON_URL
+    base = mirror.rstrip("/")
+    for name in ("ADOBE_PRODUCTS_XML_URL", "ADOBE_APPLICATION_JSON_URL"):
+        url = urlsplit(globals()[name])
+        globals()[name] = base + url.path + ("?" + url.query if url.query else "")
+
+    print(f"\nUsing mirror: {base}")
+
+
+def start_tracing(args: argparse.Namespace) -> None:
+    """Record phase spans and profile if requested, files are written on exit"""
+    global traceEvents, profiler
+    # every job of job file has its own files
+    suffix = "" if args.jobIndex is None else f".{args.jobIndex}"
+    if args.trace:
+        traceEvents = []
+        atexit.register(write_trace, args.trace + suffix)
+    if args.profile:
+        profiler = cProfile.Profile()
+        atexit.register(write_profile, args.profile + suffix)
+
+
+def trace_tid() -> int:
+    """Trace row of current thread or asyncio task"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return id(task) & 0xFFFFFFFF
+    return threading.get_ident() & 0xFFFFFFFF
+
+
+def add_trace(name: str, cat: str, start: float, end: float, args: dict) -> None:
+    """Add complete event (times from time.perf_counter)"""
+    if traceEvents is None:
+        return
+    event = {
+        "name": name,
+        "cat": cat,
+        "ph": "X",
+        "ts": round((start - TRACE_START) * 1e6, 1),
+        "dur": round((end - start) * 1e6, 1),
+        "pid": os.getpid(),
+        "tid": trace_tid(),
+        "args": args,
     }
+    with traceLock:
+        traceEvents.append(event)
+
+
+@contextmanager
+def trace_span(name: str, cat: str = "phase", profile: bool = False, **args):
+    """Record span of phase, profile it too when it is not waiting for network"""
+    with profile_section(profile):
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            add_trace(name, cat, start, time.perf_counter(), args)
+
+
+@contextmanager
+def profile_section(profile: bool = True):
+    """Profile block, nested blocks keep profiler running"""
+    global profileDepth
+    # profiler follows main thread only
+    profiling = (
+        profile and profiler is not None
+        and threading.current_thread() is threading.main_thread()
+    )
+    if profiling:
+        if profileDepth == 0:
+            profiler.enable()
+        profileDepth += 1
+
+    try:
+        yield
+    finally:
+        if profiling:
+            profileDepth -= 1
+            if profileDepth == 0:
+                profiler.disable()
+
+
+@contextmanager
+def profile_paused():
+    """Stop profiling while waiting for network inside profiled span"""
+    paused = (
+        profileDepth > 0
+        and threading.current_thread() is threading.main_thread()
+    )
+    if paused:
+        profiler.disable()
+    try:
+        yield
+    finally:
+        if paused:
+            profiler.enable()
+
+
+def network_chunks(chunks):
+    """Yield chunks, profiler is paused while they are read from network"""
+    while True:
+        with profile_paused():
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
 
 
-def create_xml(name: str, data) -> None:
-    """Write data to xml file"""
-    with open(name, "wb+") as f:
-        f.write(data)
+def write_trace(traceFile: str) -> None:
+    """Save spans as Chrome trace event file"""
+    with traceLock:
+        events = list(traceEvents)
+    create_json(traceFile, {"traceEvents": events, "displayTimeUnit": "ms"})
+    print(f"\nTrace saved to {traceFile}")
+
+
+def write_profile(profileFile: str) -> None:
+    """Save profile of parse, filter and resolve phases"""
+    profiler.dump_stats(profileFile)
+    print(f"\nProfile saved to {profileFile}")
 
 
 def create_json(name: str, data) -> None:
@@ -293,23 +909,26 @@ def append_file(name: str, data: str | None) -> None:
             f.write(data + "\n")
 
 
+def conditional_headers(header: dict, meta: dict | None) -> dict:
+    """Add cache validators to request headers"""
+    if not meta:
+        return header
+
+    header = header.copy()
+    if meta.get("etag"):
+        header["If-None-Match"] = meta["etag"]
+    if meta.get("lastModified"):
+        header["If-Modified-Since"] = meta["lastModified"]
+    return header
+
+
 def download_data(url: str, header: dict) -> bytes:
     """Get raw data"""
-    try:
-        response = session.get(url, stream=True, headers=header)
-        response.encoding = "utf-8"
-        response.raise_for_status()
+    if cfg["engine"] == "asyncio":
+        return run_async(async_download_data(url, header))
 
-        total_size = int(response.headers.get("content-length", 0))
-        chunk_size = 1024  # 1 KB chunks
-        mem_file = io.BytesIO()
-        with tqdm(total=total_size or None, unit="B", unit_scale=True, unit_divisor=1024) as pbar:
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                mem_file.write(chunk)
-                pbar.update(len(chunk))
-
-        downData = mem_file.getvalue()
-        mem_file.close()
+    try:
+        downData = b"".join(stream_data(url, header))
 
     except requests.exceptions.HTTPError as err_h:
         print(f"Connection error occurred: {err_h}")
@@ -324,33 +943,160 @@ def download_data(url: str, header: dict) -> bytes:
     sys.exit("\nCannot download data!")
 
 
-def download_json(url: str, header: dict, file: str | None = None) -> dict:
-    """Download json data(use filename for testing)"""
-    if file and Path(file).is_file():
-        with open(file, "r") as f:
-            return json.load(f)
+def stream_data(url: str, header: dict, meta: dict | None = None):
+    """Open data stream, return chunks iterator or None if data is not modified"""
+    response = session.get(
+        url, stream=True, headers=conditional_headers(header, meta))
+    response.raise_for_status()
 
-    jsonData = download_data(url, header)
+    if meta is not None:
+        if response.status_code == 304:
+            return None
+        # validators for next request
+        meta["etag"] = response.headers.get("ETag")
+        meta["lastModified"] = response.headers.get("Last-Modified")
 
-    if file:
-        create_json(file, json.loads(jsonData.decode('utf-8')))
+    return response_chunks(response, url)
 
-    return json.loads(jsonData.decode('utf-8'))
 
+def response_chunks(response: requests.Response, url: str):
+    """Yield response data with progress bar"""
+    total_size = int(response.headers.get("content-length", 0))
+    chunk_size = read_size()
+    with tqdm(total=total_size or None, unit="B", unit_scale=True, unit_divisor=1024,
+              disable=cfg["progress"] != "file") as pbar:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            pbar.update(len(chunk))
+            throttle(len(chunk), url)
+            yield chunk
 
-def download_xml(url: str, header: dict, file=None) -> ET.ElementTree:
-    """Download xml data(use filename for testing)"""
-    if file and Path(file).is_file():
-        return ET.parse(file)
 
-    xmlData = download_data(url, header)
+def file_chunks(path: str):
+    """Yield file data"""
+    with open(path, "rb") as f:
+        while chunk := f.read(cfg["chunkSize"]):
+            yield chunk
+
 
-    if file:
-        create_xml(file, xmlData)
+def download_xml(url: str, header: dict) -> ET.Element:
+    """Download xml data"""
+    xmlData = download_data(url, header)
 
     return ET.fromstring(xmlData)
 
 
+def catalog_files(url: str) -> tuple[str, str]:
+    """Get cache files of products xml and its meta data"""
+    # one cache file for each url version and platforms
+    name = "catalog-" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    return (os.path.join(cfg["cacheDir"], name + ".xml"),
+            os.path.join(cfg["cacheDir"], name + ".json"))
+
+
+def catalog_meta(xmlFile: str, metaFile: str) -> dict:
+    """Get cache meta data of products xml, empty if it is not cached"""
+    meta = {}
+    if os.path.isfile(xmlFile) and os.path.isfile(metaFile):
+        with open(metaFile, "r") as f:
+            meta = json.load(f)
+    return meta
+
+
+def catalog_chunks(url: str):
+    """Yield products xml from cache or network, exit on download error"""
+    try:
+        yield from cached_catalog(url)
+
+    except requests.exceptions.HTTPError as err_h:
+        print(f"Connection error occurred: {err_h}")
+        sys.exit("\nCannot download data!")
+
+    except requests.exceptions.RequestException as err_r:
+        print(f"Unexpected error occurred: {err_r}")
+        sys.exit("\nCannot download data!")
+
+
+def cached_catalog(url: str):
+    """Yield products xml from cache or network, network data is saved to cache"""
+    xmlFile, metaFile = catalog_files(url)
+    meta = catalog_meta(xmlFile, metaFile)
+    if meta and time.time() - meta["time"] < cfg["catalogTtl"]:
+        print("\nUsing cached products list...")
+        yield from file_chunks(xmlFile)
+        return
+
+    print("\nDownloading all available products...")
+    # products lists may be downloaded from several threads
+    with profile_paused():
+        chunks = stream_data(url, ADOBE_REQ_HEADERS, meta)
+
+    if chunks is None:
+        print("\nProducts list is not changed, using cached list...")
+        yield from file_chunks(xmlFile)
+    else:
+        # parse and save to cache at the same time
+        with open(xmlFile + ".part", "wb") as f:
+            for chunk in network_chunks(chunks):
+                f.write(chunk)
+                yield chunk
+        os.replace(xmlFile + ".part", xmlFile)
+
+    meta["url"] = url
+    meta["time"] = time.time()
+    create_json(metaFile, meta)
+
+
+async def async_cached_catalog(url: str):
+    """Yield products xml from cache or network with asyncio engine"""
+    xmlFile, metaFile = catalog_files(url)
+    meta = catalog_meta(xmlFile, metaFile)
+    if meta and time.time() - meta["time"] < cfg["catalogTtl"]:
+        print("\nUsing cached products list...")
+        for chunk in file_chunks(xmlFile):
+            yield chunk
+        return
+
+    print("\nDownloading all available products...")
+    client = await get_aio_session()
+    try:
+        async with client.get(url, headers=conditional_headers(ADOBE_REQ_HEADERS, meta)) as response:
+            response.raise_for_status()
+            changed = response.status != 304
+            if changed:
+                # validators for next request
+                meta["etag"] = response.headers.get("ETag")
+                meta["lastModified"] = response.headers.get("Last-Modified")
+
+                # parse and save to cache at the same time
+                total_size = int(response.headers.get("content-length", 0))
+                with tqdm(total=total_size or None, unit="B", unit_scale=True, unit_divisor=1024,
+                          disable=cfg["progress"] != "file") as pbar:
+                    with open(xmlFile + ".part", "wb") as f:
+                        async for chunk in response.content.iter_chunked(read_size()):
+                            f.write(chunk)
+                            pbar.update(len(chunk))
+                            yield chunk
+                            await asyncio.sleep(throttle_delay(len(chunk), url))
+                os.replace(xmlFile + ".part", xmlFile)
+
+    except aiohttp.ClientResponseError as err_h:
+        print(f"Connection error occurred: {err_h}")
+        sys.exit("\nCannot download data!")
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as err_r:
+        print(f"Unexpected error occurred: {err_r}")
+        sys.exit("\nCannot download data!")
+
+    if not changed:
+        print("\nProducts list is not changed, using cached list...")
+        for chunk in file_chunks(xmlFile):
+            yield chunk
+
+    meta["url"] = url
+    meta["time"] = time.time()
+    create_json(metaFile, meta)
+
+
 def product_icons(elem: dict) -> list[str]:
     """Get icons for product"""
     productIcons = []
@@ -376,92 +1122,333 @@ def get_products(cfg: dict) -> dict:
         urlVersion=cfg["reqUrlVer"], reqPlatforms=cfg["urlPlatforms"]
     )
 
-    print("\nDownloading all available products...")
-    productXml = download_xml(products_xml_url, ADOBE_REQ_HEADERS)
-
-    # add cdn address to config
-    cfg['cdn'] = productXml.find(".//*/cdn/secure").text
-
-    # parse xml data
-    allProducts = {}
-    for channel in productXml.findall(".//channel"):
-        appType = "dep"
-        if channel.attrib["name"] == "ccm":
-            appType = "app"
-
-        for product in channel.findall("./products/product"):
-            sapCode = product.get("id")
-            displayName = product.find("displayName").text
-            for plat in [
-                item
-                for item in product.findall("./platforms/platform")
-                if item.attrib["id"] in cfg["allowedPlatforms"]
-            ]:
-                appPlatform = plat.attrib["id"]
-                # platform filter for main app
-                if appType == "app" and appPlatform != cfg["reqAppPlatform"]:
-                    continue
+    with trace_span("catalog", profile=True, origin=cfg["origin"]) as span:
+        allProducts = parse_products(catalog_chunks(products_xml_url), cfg)
+        span["products"] = len(allProducts)
+    with trace_span("catalog index", profile=True, origin=cfg["origin"]):
+        save_catalog(allProducts, cfg)
 
-                if plat.findall(
-                    "./languageSet[@packageType='hdPackage']"
-                ) or plat.findall("./languageSet[@packageType='application']"):
-                    if not allProducts.get(sapCode):
-                        allProducts[sapCode] = {
-                            "appType": appType,
-                            "displayName": displayName,
-                            "sapCode": sapCode,
-                            "versions": OrderedDict(),
-                        }
-
-                    for ls in plat.findall("languageSet"):
-                        languageSet = ls.attrib
-                        productVersion = languageSet.get("productVersion")
-
-                        manifestURL = ls.find(".//manifestURL")
-                        if manifestURL is not None:
-                            manifestURL = manifestURL.text
-
-                        if (
-                            productVersion is None
-                            and ls.find(".//appVersion") is not None
-                        ):
-                            productVersion = ls.find(".//appVersion").text
-
-                        # check available languages using tutorial pages
-                        langList = product_languages(ls)
-                        if len(langList) == 1 and langList[0] == "mul":
-                            tutLangs = []
-                            for cEntries in product.findall("./custom-data/custom-entry"):
-                                eKey = cEntries.get("key")
-                                if "tutorialsPage_" in eKey:
-                                    tutLocale = eKey.split("_", 1)[1]
-                                    if tutLocale != "mul":
-                                        tutLangs.append(tutLocale)
-
-                            if tutLangs:
-                                langList = tutLangs
-
-                        # get product with version
-                        if productVersion is not None:
-                            allProducts[sapCode]["versions"][productVersion] = {
-                                "sapCode": sapCode,
-                                "displayName": displayName,
-                                "appPlatform": appPlatform,
-                                "productVersion": productVersion,
-                                "supportedLanguages": langList,
-                                "buildGuid": languageSet.get("buildGuid"),
-                                "manifestURL": manifestURL,
-                            }
-                            if cfg["downIcons"]:
-                                allProducts[sapCode]["versions"][productVersion]['productIcons'] = product_icons(
-                                    product)
-                        else:
-                            if int(cfg["reqUrlVer"]) >= 5:
-                                allProducts.pop(sapCode, None)
+    return allProducts
+
+
+async def async_get_products(cfg: dict) -> dict:
+    """Get all product and dependencies list with asyncio engine"""
+    products_xml_url = ADOBE_PRODUCTS_XML_URL.format(
+        urlVersion=cfg["reqUrlVer"], reqPlatforms=cfg["urlPlatforms"]
+    )
+
+    with trace_span("catalog", origin=cfg["origin"]) as span:
+        parser = ET.XMLParser(target=CatalogBuilder({}, cfg))
+        async for chunk in async_cached_catalog(products_xml_url):
+            # other products lists are downloaded between chunks, profile parsing only
+            with profile_section():
+                parser.feed(chunk)
+        with profile_section():
+            allProducts = parser.close()
+        span["products"] = len(allProducts)
+    with trace_span("catalog index", profile=True, origin=cfg["origin"]):
+        save_catalog(allProducts, cfg)
 
     return allProducts
 
 
+def get_catalogs(config: dict) -> OrderedDict:
+    """Get products lists of all url versions and platforms at the same time"""
+    catalogs = OrderedDict()
+    originCfgs = [config]
+    if len(config["origins"]) > 1:
+        originCfgs = [origin_config(config, *o) for o in config["origins"]]
+
+    if config["engine"] == "asyncio":
+        results = run_async(async_get_catalogs(originCfgs))
+    elif len(originCfgs) == 1:
+        results = [get_products(config)]
+    else:
+        with ThreadPoolExecutor(max_workers=len(originCfgs)) as executor:
+            results = list(executor.map(get_products, originCfgs))
+
+    for c, allProducts in zip(originCfgs, results):
+        if len(originCfgs) > 1:
+            print("\nFound {} products for {}".format(len(allProducts), c["origin"]))
+        catalogs[c["origin"]] = (c, allProducts)
+
+    return catalogs
+
+
+async def async_get_catalogs(originCfgs: list[dict]) -> list[dict]:
+    """Get products lists of all url versions and platforms with asyncio engine"""
+    return await asyncio.gather(*(async_get_products(c) for c in originCfgs))
+
+
+def merge_products(catalogs: OrderedDict) -> dict:
+    """Merge products lists into one index, products know their origins"""
+    merged = {}
+    for origin, (_, allProducts) in catalogs.items():
+        for sapCode, product in allProducts.items():
+            if sapCode not in merged:
+                merged[sapCode] = dict(
+                    product, versions=OrderedDict(), origins=[])
+            merged[sapCode]["origins"].append(origin)
+            for ver, info in product["versions"].items():
+                merged[sapCode]["versions"].setdefault(ver, info)
+    return merged
+
+
+class CatalogBuilder(ET.TreeBuilder):
+    """Tree builder of products xml, adds each product when its end tag is parsed"""
+
+    def __init__(self, allProducts: dict, cfg: dict):
+        super().__init__()
+        self.allProducts = allProducts
+        self.cfg = cfg
+        # open elements, parent of element is before it
+        self.path = []
+        self.appType = None
+        self.cdn = None
+
+    def start(self, tag, attrs):
+        elem = super().start(tag, attrs)
+        if tag == "channel":
+            self.appType = "dep"
+            if attrs.get("name") == "ccm":
+                self.appType = "app"
+        self.path.append(elem)
+        return elem
+
+    def end(self, tag):
+        elem = super().end(tag)
+        path = self.path
+        path.pop()
+        if len(path) < 2:
+            return elem
+
+        parent = path[-1]
+        if tag == "product" and parent.tag == "products" and path[-2].tag == "channel":
+            add_product(self.allProducts, elem, self.appType, self.cfg)
+            # parsed product is not needed anymore
+            elem.clear()
+            parent.remove(elem)
+
+        elif tag == "secure" and parent.tag == "cdn" and len(path) > 2:
+            if self.cdn is None:
+                self.cdn = elem.text
+
+        elif tag == "channel":
+            self.appType = None
+            elem.clear()
+
+        return elem
+
+    def close(self) -> dict:
+        super().close()
+        # add cdn address to config
+        self.cfg['cdn'] = self.cdn
+        return self.allProducts
+
+
+def parse_products(chunks, cfg: dict) -> dict:
+    """Parse products xml in one pass while it is downloaded"""
+    parser = ET.XMLParser(target=CatalogBuilder({}, cfg))
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def add_product(allProducts: dict, product: ET.Element, appType: str, cfg: dict) -> None:
+    """Add product versions from product element"""
+    sapCode = product.get("id")
+    displayName = product.find("displayName").text
+    tutLangs = None
+    for plat in product.iterfind("./platforms/platform"):
+        appPlatform = plat.attrib["id"]
+        if appPlatform not in cfg["allowedPlatforms"]:
+            continue
+
+        # platform filter for main app
+        if appType == "app" and appPlatform != cfg["reqAppPlatform"]:
+            continue
+
+        langSets = plat.findall("languageSet")
+        if not any(
+            ls.get("packageType") in ("hdPackage", "application") for ls in langSets
+        ):
+            continue
+
+        if not allProducts.get(sapCode):
+            allProducts[sapCode] = {
+                "appType": appType,
+                "displayName": displayName,
+                "sapCode": sapCode,
+                "origin": cfg["origin"],
+                "versions": OrderedDict(),
+            }
+
+        for ls in langSets:
+            languageSet = ls.attrib
+            productVersion = languageSet.get("productVersion")
+
+            manifestURL = ls.find(".//manifestURL")
+            if manifestURL is not None:
+                manifestURL = manifestURL.text
+
+            if productVersion is None:
+                appVersion = ls.find(".//appVersion")
+                if appVersion is not None:
+                    productVersion = appVersion.text
+
+            # check available languages using tutorial pages
+            langList = product_languages(ls)
+            if len(langList) == 1 and langList[0] == "mul":
+                if tutLangs is None:
+                    tutLangs = []
+                    for cEntries in product.iterfind("./custom-data/custom-entry"):
+                        eKey = cEntries.get("key")
+                        if "tutorialsPage_" in eKey:
+                            tutLocale = eKey.split("_", 1)[1]
+                            if tutLocale != "mul":
+                                tutLangs.append(tutLocale)
+
+                if tutLangs:
+                    langList = tutLangs
+
+            # get product with version
+            if productVersion is not None:
+                allProducts[sapCode]["versions"][productVersion] = {
+                    "sapCode": sapCode,
+                    "displayName": displayName,
+                    "appPlatform": appPlatform,
+                    "productVersion": productVersion,
+                    "supportedLanguages": langList,
+                    "buildGuid": languageSet.get("buildGuid"),
+                    "manifestURL": manifestURL,
+                }
+                if cfg["downIcons"]:
+                    allProducts[sapCode]["versions"][productVersion]['productIcons'] = product_icons(
+                        product)
+            else:
+                if int(cfg["reqUrlVer"]) >= 5:
+                    allProducts.pop(sapCode, None)
+
+
+def catalog_db(cacheDir: str) -> sqlite3.Connection:
+    """Open indexed products list"""
+    db = sqlite3.connect(os.path.join(cacheDir, CATALOG_DB))
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS products (
+            origin TEXT, sapCode TEXT, appType TEXT, displayName TEXT,
+            PRIMARY KEY (origin, sapCode));
+        CREATE TABLE IF NOT EXISTS versions (
+            origin TEXT, sapCode TEXT, productVersion TEXT, versionKey TEXT,
+            appPlatform TEXT, buildGuid TEXT, manifestURL TEXT, languages TEXT,
+            PRIMARY KEY (origin, sapCode, productVersion));
+        CREATE INDEX IF NOT EXISTS versions_order
+            ON versions (sapCode, appPlatform, versionKey);
+    """)
+    return db
+
+
+def db_version_key(version: str) -> str:
+    """Version as text that sorts like version_key"""
+    return ".".join(
+        p.zfill(10) if p.isdigit() else "~" + p
+        for p in re.split(r"[.\-_ ]", version)
+    )
+
+
+def save_catalog(allProducts: dict, cfg: dict) -> None:
+    """Save parsed products list to indexed store"""
+    origin = cfg["origin"]
+    with closing(catalog_db(cfg["cacheDir"])) as db, db:
+        db.execute("DELETE FROM products WHERE origin = ?", (origin,))
+        db.execute("DELETE FROM versions WHERE origin = ?", (origin,))
+        db.executemany(
+            "INSERT INTO products VALUES (?, ?, ?, ?)",
+            [
+                (origin, p["sapCode"], p["appType"], p["displayName"])
+                for p in allProducts.values()
+            ],
+        )
+        db.executemany(
+            "INSERT INTO versions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    origin, v["sapCode"], v["productVersion"],
+                    db_version_key(v["productVersion"]), v["appPlatform"],
+                    v["buildGuid"], v["manifestURL"],
+                    ",".join(v["supportedLanguages"]),
+                )
+                for p in allProducts.values()
+                for v in p["versions"].values()
+            ],
+        )
+
+
+def run_query(args: argparse.Namespace) -> None:
+    """Answer products list questions from indexed store"""
+    dbFile = os.path.join(cache_dir(args), CATALOG_DB)
+    if not os.path.isfile(dbFile):
+        sys.exit("\nNo products list found. Run a download first to create it.")
+
+    where = ["1"]
+    params = []
+    if args.urlVersion:
+        urlVers = ["v" + v.strip()[-1] for v in args.urlVersion.split(",")]
+        where.append("substr(v.origin, 1, 2) IN ({})".format(
+            ",".join("?" * len(urlVers))))
+        params += urlVers
+    if args.appPlatform:
+        platforms = [p.strip() for p in args.appPlatform.split(",")]
+        where.append("v.appPlatform IN ({})".format(
+            ",".join("?" * len(platforms))))
+        params += platforms
+    if args.sapCode:
+        codes = args.sapCode.upper().split(",")
+        where.append("v.sapCode IN ({})".format(",".join("?" * len(codes))))
+        params += codes
+    if args.version:
+        where.append("v.productVersion = ?")
+        params.append(args.version)
+
+    query = args.query
+    with closing(catalog_db(cache_dir(args))) as db:
+        rows = db.execute(
+            """SELECT v.sapCode, p.displayName, p.appType, v.productVersion,
+                      v.appPlatform, v.origin, v.languages
+               FROM versions v JOIN products p
+                 ON p.origin = v.origin AND p.sapCode = v.sapCode
+               WHERE {} AND (v.buildGuid IS NOT NULL OR v.manifestURL IS NOT NULL)
+               ORDER BY v.sapCode, v.appPlatform, v.versionKey""".format(" AND ".join(where)),
+            params,
+        ).fetchall()
+
+    if query == "products":
+        seen = {}
+        for sap, name, appType, *_ in rows:
+            if args.sapCode or appType == "app":
+                seen[sap] = name
+        for sap, name in seen.items():
+            print("[{}]{}{}".format(sap, (10 - len(sap)) * " ", name))
+
+    elif query == "versions":
+        for sap, name, appType, ver, plat, origin, langs in rows:
+            print("{}{}{}{}{}".format(
+                sap, (10 - len(sap)) * " ", ver.ljust(16), plat.ljust(10), origin))
+
+    else:
+        # last row of each product and platform is latest
+        latest = OrderedDict()
+        for row in rows:
+            latest[(row[0], row[4])] = row
+
+        for sap, name, appType, ver, plat, origin, langs in latest.values():
+            if query == "latest":
+                print("{}{}{}{}".format(
+                    sap, (10 - len(sap)) * " ", plat.ljust(10), ver))
+            else:
+                print("{}{}{}{} {}".format(
+                    sap, (10 - len(sap)) * " ", plat.ljust(10), ver.ljust(16), langs))
+
+
 def select_product(allProducts: dict) -> str:
     """Select a product to down"""
     selectedProduct = None
@@ -480,15 +1467,32 @@ def select_product(allProducts: dict) -> str:
     return selectedProduct
 
 
+def version_key(version: str) -> tuple:
+    """Sort key of version string, numbers compare as numbers"""
+    return tuple(
+        (0, int(p), "") if p.isdigit() else (1, 0, p)
+        for p in re.split(r"[.\-_ ]", version)
+    )
+
+
+def sorted_versions(versions: dict) -> list[dict]:
+    """Get downloadable versions from oldest to latest"""
+    return sorted(
+        (
+            v for v in versions.values()
+            if v["buildGuid"] is not None or v["manifestURL"] is not None
+        ),
+        key=lambda v: version_key(v["productVersion"]),
+    )
+
+
 def get_last_version(versions: dict) -> str:
     """Ge last version of selected product"""
-    last = None
-    for v in reversed(versions.values()):
-        if v["buildGuid"] is not None or v["manifestURL"] is not None:
-            last = v["productVersion"]
-        else:
-            print("\nCannot determine latest version!\n")
-    return last
+    availVer = sorted_versions(versions)
+    if not availVer:
+        print("\nCannot determine latest version!\n")
+        return None
+    return availVer[-1]["productVersion"]
 
 
 def show_avail_products(allProducts: dict) -> None:
@@ -520,6 +1524,9 @@ def download_list(allProducts: dict) -> list[str]:
                 print(f"\nAdd {prodToDown} to download list")
                 codeList.append(prodToDown)
 
+            elif cfg["headless"]:
+                print(f"\n{prodToDown} is not available, skipped")
+
             else:
                 print(f"\n{prodToDown} is not available!\n")
                 answer = None
@@ -544,6 +1551,9 @@ def download_list(allProducts: dict) -> list[str]:
                         print("\nPlease enter yes or no!")
                         answer = None
 
+    elif cfg["headless"]:
+        sys.exit("\nNo products to download!")
+
     else:
         toDown = select_product(allProducts)
         codeList.append(toDown)
@@ -555,27 +1565,29 @@ def select_app_version(product: dict, batch: bool) -> str:
     """Select version for product"""
     availVer = product["versions"]
     version = None
-    if batch:
-        version = get_last_version(availVer)
-    elif cfg["reqVer"]:
+    if cfg["reqVer"] and (not batch or cfg["headless"]):
         reqVersion = cfg["reqVer"]
         if availVer.get(reqVersion):
             print(f"\nUsing provided version: {reqVersion}")
             version = reqVersion
+        elif cfg["headless"]:
+            sys.exit("\nVersion {} of {} not found!".format(
+                reqVersion, product["sapCode"]))
         else:
             print(f"\nProvided version not found: {reqVersion}")
+    elif batch or cfg["headless"]:
+        version = get_last_version(availVer)
 
     if not version:
         lastVersion = None
         print("\nAvailable versions list")
-        for v in reversed(availVer.values()):
-            if v["buildGuid"] is not None or v["manifestURL"] is not None:
-                print(
-                    "{} for {} - {}".format(
-                        product["displayName"], v["appPlatform"], v["productVersion"]
-                    )
+        for v in sorted_versions(availVer):
+            print(
+                "{} for {} - {}".format(
+                    product["displayName"], v["appPlatform"], v["productVersion"]
                 )
-                lastVersion = v["productVersion"]
+            )
+            lastVersion = v["productVersion"]
 
         while version is None:
             val = (
@@ -660,6 +1672,9 @@ def install_language(appLangs: list[str]) -> list[str]:
                 installLanguage.append(l)
             else:
                 print(f"\nProvided language not available: {l}")
+                if cfg["headless"] and len(appLangs) > 1:
+                    continue
+
                 if len(appLangs) == 1:
                     print(
                         f"\nSet language to available language {appLangs[0]}")
@@ -680,265 +1695,913 @@ def install_language(appLangs: list[str]) -> list[str]:
                     installLanguage.append(newLang)
 
         if installLanguage == []:
+            if cfg["headless"]:
+                sys.exit("\nNo language selected!")
             if questiony("\nNo language selected. Do you want to quit?"):
                 sys.exit("Bye!")
         # update configuration
         # cfg["reqLang"] = installLanguage
 
+    elif cfg["headless"]:
+        print(f"\nUsing default language: {defLang}")
+        installLanguage = [defLang]
+
     else:
         installLanguage = [select_language(appLangs, defLang)]
 
     return installLanguage
 
 
-def download_file(url: str, dest: str, prefix=None) -> bool:
-    """Download package file"""
-    filename = os.path.basename(url)
-    if prefix:
-        filename = prefix + filename
+class PackageBar:
+    """Progress of one package, shown per file or in batch total and counted in metrics"""
 
-    destDir = os.path.join(dest, filename)
+    def __init__(self, total: int, initial: int = 0):
+        self.stats = transferVar.get()
+        self.bar = None
+        if cfg["progress"] == "file":
+            self.bar = tqdm(total=total, unit="iB", unit_scale=True)
+        self.resume(initial)
 
-    try:
-        # get file size
-        response = session.head(url, stream=False, headers=ADOBE_DL_HEADERS)
-        lengthInBytes = int(response.headers.get("content-length", 0))
+    def update(self, n: int) -> None:
+        """Count bytes from network"""
+        self.add(n, False)
 
-        if (
-            cfg["skip"]
-            and os.path.isfile(destDir)
-            and os.path.getsize(destDir) == lengthInBytes
-        ):
-            print(f"\nDownloaded file seems OK, skipping...")
-            return True
+    def resume(self, n: int) -> None:
+        """Count bytes already on disk"""
+        self.add(n, True)
 
-        # download file
-        response = session.get(url, stream=True, headers=ADOBE_REQ_HEADERS)
+    def add(self, n: int, cached: bool) -> None:
+        if not n:
+            return
+        if self.bar is not None:
+            self.bar.update(n)
+        if totalBar is not None:
+            totalBar.update(n)
+        record_bytes(self.stats, n, cached)
 
-        blockSize = 1024  # 1 Kilobyte
-        with tqdm(total=lengthInBytes, unit="iB", unit_scale=True) as pBar:
-            with open(destDir, "wb") as file:
-                for data in response.iter_content(blockSize):
-                    pBar.update(len(data))
-                    file.write(data)
-    except Exception as e:
-        print(f"An unexpected error occurred! {e}")
-    else:
-        return True
+    def __enter__(self):
+        return self
 
-    return False
+    def __exit__(self, *exc) -> None:
+        if self.bar is not None:
+            self.bar.close()
 
 
-def download_icons(prodInfo: list) -> None:
-    """Download product icons"""
-    print("\nDownloading product icons...\n")
+def metric_host(url: str) -> str:
+    """Host name for metrics"""
+    return urlsplit(url).netloc or "local"
 
-    iconsDir = os.path.join(cfg["productDir"], "icons")
-    os.makedirs(iconsDir, exist_ok=True)
 
-    icons = prodInfo["productIcons"]
-    prefix = prodInfo["sapCode"].lower()
+def record_bytes(stats: dict | None, n: int, cached: bool) -> None:
+    """Count downloaded or locally found bytes"""
+    with metricsLock:
+        if cached:
+            metrics["cacheBytes"] += n
+        else:
+            metrics["networkBytes"] += n
+        if stats is None:
+            return
+
+        stats["cached" if cached else "bytes"] += n
+        if not cached:
+            host = metrics["hosts"].setdefault(stats["host"], {
+                "bytes": 0, "requests": 0, "requestSeconds": 0.0, "errors": 0})
+            host["bytes"] += n
+
+
+def record_request(url: str, seconds: float, status: int) -> None:
+    """Count request and its latency (time to response headers)"""
+    with metricsLock:
+        host = metrics["hosts"].setdefault(metric_host(url), {
+            "bytes": 0, "requests": 0, "requestSeconds": 0.0, "errors": 0})
+        host["requests"] += 1
+        host["requestSeconds"] += seconds
+        if status >= 400:
+            host["errors"] += 1
+
+
+def count_metric(name: str, n: int = 1) -> None:
+    """Increase counter of metrics"""
+    with metricsLock:
+        metrics["counters"][name] = metrics["counters"].get(name, 0) + n
+
+
+def transfer_start(task: dict) -> dict:
+    """Start counting transfer of package in this thread or asyncio task"""
+    stats = {
+        "task": task,
+        "host": metric_host(task["url"]),
+        "start": time.time(),
+        "traceStart": time.perf_counter(),
+        "bytes": 0,
+        "cached": 0,
+    }
+    transferVar.set(stats)
+    return stats
+
+
+def transfer_end(stats: dict, done: bool) -> None:
+    """Finish counting transfer of package"""
+    task = stats["task"]
+    transferVar.set(None)
+    if done:
+        # found in store or skipped, not counted by progress
+        rest = task["size"] - stats["bytes"] - stats["cached"]
+        if rest > 0:
+            if totalBar is not None:
+                totalBar.update(rest)
+            record_bytes(stats, rest, True)
+    elif totalBar is not None:
+        # downloaded again when retried
+        totalBar.update(-(stats["bytes"] + stats["cached"]))
+
+    seconds = time.time() - stats["start"]
+    key = "{}_{}".format(task["sapCode"], task["version"])
+    with metricsLock:
+        metrics["counters"]["packagesDone" if done else "packagesFailed"] = \
+            metrics["counters"].get("packagesDone" if done else "packagesFailed", 0) + 1
+        product = metrics["products"].setdefault(key, {
+            "sapCode": task["sapCode"], "version": task["version"], "start": stats["start"],
+            "end": 0.0, "bytes": 0, "cacheBytes": 0, "packages": 0, "failed": 0})
+        product["start"] = min(product["start"], stats["start"])
+        product["end"] = max(product["end"], time.time())
+        product["bytes"] += stats["bytes"]
+        product["cacheBytes"] += stats["cached"]
+        product["packages"] += 1
+        product["failed"] += 0 if done else 1
+
+    add_trace("package", "transfer", stats["traceStart"], time.perf_counter(), {
+        "sapCode": task["sapCode"],
+        "name": os.path.basename(task["url"]),
+        "host": stats["host"],
+        "bytes": stats["bytes"],
+        "cacheBytes": stats["cached"],
+        "ok": done,
+    })
+
+    write_event({
+        "event": "package",
+        "sapCode": task["sapCode"],
+        "version": task["version"],
+        "name": os.path.basename(task["url"]),
+        "host": stats["host"],
+        "bytes": stats["bytes"],
+        "cacheBytes": stats["cached"],
+        "seconds": round(seconds, 3),
+        "ok": done,
+    })
+
+
+def metrics_snapshot() -> dict:
+    """Current metrics values"""
+    with metricsLock:
+        elapsed = max(time.time() - metrics["started"], 0.001)
+        hosts = {}
+        for name, host in metrics["hosts"].items():
+            hosts[name] = dict(host, bytesPerSecond=round(host["bytes"] / elapsed),
+                               requestLatency=round(host["requestSeconds"] / host["requests"], 4) if host["requests"] else None)
+        products = []
+        for product in metrics["products"].values():
+            products.append(dict(product, seconds=round(product["end"] - product["start"], 3)))
+        return {
+            "elapsed": round(elapsed, 3),
+            "networkBytes": metrics["networkBytes"],
+            "cacheBytes": metrics["cacheBytes"],
+            "bytesPerSecond": round(metrics["networkBytes"] / elapsed),
+            "counters": dict(metrics["counters"]),
+            "hosts": hosts,
+            "products": products,
+        }
 
-    for url in icons:
-        download_file(url, iconsDir, prefix)
 
+def write_event(event: dict) -> None:
+    """Append event to metrics json lines file"""
+    if not cfg["metrics"]:
+        return
+    event = dict(event, time=round(time.time(), 3))
+    with metricsLock:
+        append_file(cfg["metrics"], json.dumps(event))
+
+
+def write_prom(snapshot: dict) -> None:
+    """Write metrics as Prometheus text file"""
+    if not cfg["promFile"]:
+        return
+
+    def label(value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+    lines = [
+        "# TYPE ccdl_network_bytes_total counter",
+        f"ccdl_network_bytes_total {snapshot['networkBytes']}",
+        "# TYPE ccdl_cache_bytes_total counter",
+        f"ccdl_cache_bytes_total {snapshot['cacheBytes']}",
+        "# TYPE ccdl_events_total counter",
+    ]
+    for name, value in snapshot["counters"].items():
+        lines.append(f'ccdl_events_total{{event="{label(name)}"}} {value}')
+    lines.append("# TYPE ccdl_host_bytes_total counter")
+    for name, host in snapshot["hosts"].items():
+        lines.append(f'ccdl_host_bytes_total{{host="{label(name)}"}} {host["bytes"]}')
+    lines.append("# TYPE ccdl_host_bytes_per_second gauge")
+    for name, host in snapshot["hosts"].items():
+        lines.append(f'ccdl_host_bytes_per_second{{host="{label(name)}"}} {host["bytesPerSecond"]}')
+    lines.append("# TYPE ccdl_host_requests_total counter")
+    for name, host in snapshot["hosts"].items():
+        lines.append(f'ccdl_host_requests_total{{host="{label(name)}"}} {host["requests"]}')
+    lines.append("# TYPE ccdl_host_request_seconds_total counter")
+    for name, host in snapshot["hosts"].items():
+        lines.append(f'ccdl_host_request_seconds_total{{host="{label(name)}"}} {host["requestSeconds"]:.4f}')
+    lines.append("# TYPE ccdl_host_request_errors_total counter")
+    for name, host in snapshot["hosts"].items():
+        lines.append(f'ccdl_host_request_errors_total{{host="{label(name)}"}} {host["errors"]}')
+    lines.append("# TYPE ccdl_product_seconds gauge")
+    for p in snapshot["products"]:
+        lines.append('ccdl_product_seconds{{sap_code="{}",version="{}"}} {}'.format(
+            label(p["sapCode"]), label(p["version"]), p["seconds"]))
+    lines.append("# TYPE ccdl_product_bytes gauge")
+    for p in snapshot["products"]:
+        lines.append('ccdl_product_bytes{{sap_code="{}",version="{}"}} {}'.format(
+            label(p["sapCode"]), label(p["version"]), p["bytes"]))
+
+    # scrapers must not see half written file
+    with open(cfg["promFile"] + ".part", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(cfg["promFile"] + ".part", cfg["promFile"])
+
+
+def report_metrics(event: str) -> None:
+    """Write metrics snapshot to metrics files"""
+    if not cfg["metrics"] and not cfg["promFile"]:
+        return
+    snapshot = metrics_snapshot()
+    write_event(dict(snapshot, event=event))
+    write_prom(snapshot)
+
+
+def metrics_reporter(stop: threading.Event) -> None:
+    """Write metrics every interval until stopped"""
+    while not stop.wait(cfg["metricsInterval"]):
+        report_metrics("progress")
+
+
+def download_file(url: str, dest: str, prefix=None, size: int = 0, digest: str | None = None) -> bool:
+    """Download package file, size and digest are known values (eg. from Application.json)"""
+    filename, destDir, partFile = download_paths(url, dest, prefix)
+
+    # check existing file without asking server
+    if cfg["skip"] and size and verified_file(destDir, size, digest):
+        print(f"\nDownloaded file seems OK, skipping...")
+        return True
 
-def language_filter(pkgJson: dict | list, language: list) -> dict:
-    """Stripped out unnecessary data from json file"""
-    # Source - # https://stackoverflow.com/questions/71543579/python-find-and-replace-all-values-under-a-certain-key-in-a-nested-dictionary
-    # Posted by flakes
-    # Retrieved 2025-12-03, License - CC BY-SA 4.0
-    if "mul" in language or "all" in language:
-        return pkgJson
+    try:
+        response = None
+        # split large files to byte ranges if server supports it
+        if (
+            cfg["segments"] > 1
+            and size >= cfg["segmentMin"]
+            and (not os.path.isfile(partFile) or os.path.isfile(partFile + ".json"))
+        ):
+            with PackageBar(size) as pBar:
+                response = segmented_download(url, partFile, size, pBar)
+
+            if response is None:
+                # segments arrive out of order, digest needs one read
+                hasher = file_hasher(partFile, digest) if digest else None
+                return finish_download(partFile, destDir, size, size, size, digest, hasher)
+
+        offset = 0
+        if response is None:
+            offset, headers = resume_headers(partFile, size, filename)
+
+            # download file
+            response = session.get(url, stream=True, headers=headers)
+            if response.status_code == 416:
+                # part file is not smaller than the file
+                response.close()
+                offset = 0
+                response = session.get(
+                    url, stream=True, headers=ADOBE_REQ_HEADERS)
+            response.raise_for_status()
+
+        offset, mode = response_offset(response.status_code, offset)
+
+        # file size from the response itself
+        lengthInBytes = offset + int(response.headers.get("content-length", 0))
+
+        if existing_download(destDir, size, lengthInBytes):
+            response.close()
+            return True
 
-    if isinstance(pkgJson, dict):
-        key = "Language"
-        # filter by locale
-        for k, v in pkgJson.items():
-            filtered = None
-            if k == key:
-                filtered = []
-                for lc in v:
-                    if lc["locale"] in language or lc["locale"] == "mul":
-                        filtered.append(lc)
-
-        # replace with filtered result
-        pkgJson = {
-            k: filtered if k == key and v else language_filter(v, language)
-            for k, v in pkgJson.items()
-        }
+        # digest is updated while writing, resumed part is read once
+        hasher = None
+        if digest:
+            hasher = file_hasher(partFile, digest, offset)
 
-    if isinstance(pkgJson, list):
-        pkgJson = [language_filter(v, language) for v in pkgJson]
-
-    return pkgJson
-
-
-def do_test(cond: str, key: str | list[str]) -> bool:
-    """Test condition based on condition strings"""
-    if "==" in cond:
-        val = cond.split("==")
-        opt = operator.eq
-    elif "!=" in cond:
-        val = cond.split("!=")
-        opt = operator.ne
-    elif "<=" in cond:
-        val = cond.split("<=")
-        opt = operator.le
-    elif ">=" in cond:
-        val = cond.split(">=")
-        opt = operator.ge
-    elif ">" in cond:
-        val = cond.split(">")
-        opt = operator.gt
-    elif "<" in cond:
-        val = cond.split("<")
-        opt = operator.lt
-    else:
+        with PackageBar(lengthInBytes, offset) as pBar:
+            with open(partFile, mode) as file:
+                written = offset + \
+                    stream_to_file(response, file, pBar, hasher)
+
+        return finish_download(partFile, destDir, written, lengthInBytes, size, digest, hasher)
+    except Exception as e:
+        print(f"An unexpected error occurred! {e}")
+
+    return False
+
+
+def download_paths(url: str, dest: str, prefix=None) -> tuple[str, str, str]:
+    """Get file name, destination and unfinished download of package file"""
+    filename = os.path.basename(url)
+    if prefix:
+        filename = prefix + filename
+
+    destDir = os.path.join(dest, filename)
+    # unfinished download, renamed to destination when completed
+    return filename, destDir, destDir + ".part"
+
+
+def resume_headers(partFile: str, size: int, filename: str) -> tuple[int, dict]:
+    """Get resume offset and request headers, resume from the end of unfinished download"""
+    offset = part_offset(partFile, size)
+    headers = ADOBE_REQ_HEADERS.copy()
+    if offset:
+        print(f"\nResuming {filename} from {offset} bytes")
+        headers["Range"] = f"bytes={offset}-"
+    return offset, headers
+
+
+def response_offset(status: int, offset: int) -> tuple[int, str]:
+    """Get write offset and file mode for response status"""
+    if status != 206:
+        # server sent the whole file
+        return 0, "wb"
+    return offset, "ab"
+
+
+def existing_download(destDir: str, size: int, lengthInBytes: int) -> bool:
+    """Check existing file of package without known size with response length"""
+    if (
+        cfg["skip"]
+        and not size
+        and os.path.isfile(destDir)
+        and os.path.getsize(destDir) == lengthInBytes
+    ):
+        print(f"\nDownloaded file seems OK, skipping...")
         return True
+    return False
 
-    # stripped string
-    cmp = val[1].strip()
-
-    if "OSVersion" in val[0]:
-        keys = key.split(".")
-        cmps = cmp.split(".")
-        idx = -1
-        for c in cmps:
-            idx = idx + 1
-            if (idx > 0):
-                c = float(f"0.{c}")
-                k = float(f"0.{keys[idx]}")
-            else:
-                c = int(c)
-                k = int(keys[idx])
 
-            if opt(k, c) is not True:
-                return False
+def finish_download(partFile: str, destDir: str, written: int, lengthInBytes: int,
+                    size: int, digest: str | None, hasher) -> bool:
+    """Check downloaded file and move it to destination"""
+    if lengthInBytes and written != lengthInBytes:
+        print(
+            f"\n{os.path.basename(destDir)} is incomplete ({written} of {lengthInBytes} bytes)")
+        return False
 
-    if isinstance(key, list):
-        return cmp in key
+    if not check_download(partFile, written, size, digest, hasher):
+        return False
 
-    return opt(key, cmp)
+    os.replace(partFile, destDir)
+    write_verified(destDir, digest)
+    return True
 
 
-def test_and(str: str, osProc: str, osver: str, langs: list[str]) -> bool:
-    """Check AND (&&) test result"""
-    conds = str.split("&&")
-    for c in conds:
-        if "OSProcessorFamily" in c:
-            if do_test(c, osProc) is not True:
-                return False
+def body_reader(response: requests.Response):
+    """Get readinto of response socket file, None if body must be decoded"""
+    # urllib3 readinto reads a new bytes object and copies it,
+    # socket file of http.client fills the buffer itself
+    fp = getattr(response.raw, "_fp", None)
+    encoding = response.headers.get("content-encoding", "identity").lower()
+    if fp is None or not hasattr(fp, "readinto") or encoding not in ("", "identity"):
+        return None
+    return fp.readinto
+
+
+def stream_to_file(response: requests.Response, file, pBar, hasher=None) -> int:
+    """Copy response body to file, network reads and disk writes run in parallel"""
+    # reusable buffers, filled by socket reads and emptied by writer thread
+    freeBufs = queue.Queue()
+    for _ in range(WRITE_BUFFERS):
+        freeBufs.put(bytearray(read_size()))
+    filledBufs = queue.Queue(WRITE_BUFFERS)
+    errors = []
+
+    def writer() -> None:
+        while True:
+            item = filledBufs.get()
+            if item is None:
+                return
+            buf, size = item
+            if not errors:
+                try:
+                    with memoryview(buf) as view:
+                        file.write(view[:size])
+                        if hasher is not None:
+                            hasher.update(view[:size])
+                except Exception as e:
+                    errors.append(e)
+            if isinstance(buf, bytearray):
+                freeBufs.put(buf)
+
+    writeThread = threading.Thread(target=writer, daemon=True)
+    writeThread.start()
+
+    readinto = body_reader(response)
+    written = 0
+    try:
+        if readinto is None:
+            # compressed body, decoded chunks are new objects anyway
+            for chunk in response.iter_content(read_size()):
+                if errors:
+                    break
+                filledBufs.put((chunk, len(chunk)))
+                pBar.update(len(chunk))
+                written += len(chunk)
+                throttle(len(chunk), response.url)
+        else:
+            while not errors:
+                buf = freeBufs.get()
+                size = readinto(buf)
+                if not size:
+                    freeBufs.put(buf)
+                    # whole body is read, connection can be reused
+                    response.raw.release_conn()
+                    break
+                filledBufs.put((buf, size))
+                pBar.update(size)
+                written += size
+                throttle(size, response.url)
+    except BaseException:
+        # connection is in unknown state
+        response.close()
+        raise
+    finally:
+        filledBufs.put(None)
+        writeThread.join()
+
+    if errors:
+        response.close()
+        raise errors[0]
+
+    return written
+
+
+def package_digest(pkg: dict) -> str | None:
+    """Get package digest from Application.json data"""
+    for key in PACKAGE_DIGEST_KEYS:
+        value = pkg.get(key)
+        if not isinstance(value, str) or len(value) not in DIGEST_ALGORITHMS:
+            continue
+        try:
+            int(value, 16)
+        except ValueError:
+            continue
+        return value.lower()
+    return None
+
+
+def file_hasher(path: str, digest: str, length: int | None = None):
+    """Get hasher for digest, updated with existing file data"""
+    hasher = hashlib.new(DIGEST_ALGORITHMS[len(digest)])
+    if length == 0 or not os.path.isfile(path):
+        return hasher
+
+    remain = os.path.getsize(path) if length is None else length
+    buf = bytearray(cfg["chunkSize"])
+    with open(path, "rb") as f, memoryview(buf) as view:
+        while remain > 0:
+            size = f.readinto(buf)
+            if not size:
+                break
+            size = min(size, remain)
+            hasher.update(view[:size])
+            remain -= size
+    return hasher
+
+
+def check_download(partFile: str, written: int, size: int, digest: str | None, hasher) -> bool:
+    """Check downloaded file with Application.json size and digest"""
+    filename = os.path.basename(partFile)[:-len(".part")]
+    error = None
+    if size and written != size:
+        error = f"size {written} does not match {size}"
+    elif digest and hasher.hexdigest() != digest:
+        error = "digest does not match"
+
+    if error:
+        print(f"\n{filename} is corrupted, {error}!")
+        os.remove(partFile)
+        return False
 
-        if "OSVersion" in c:
-            if do_test(c, osver) is not True:
-                return False
+    return True
 
-        if "installLanguage" in c:
-            if "all" in langs:
-                return True
 
-            if do_test(c, langs) is not True:
-                return False
+def write_verified(path: str, digest: str | None) -> None:
+    """Record verified digest, later runs trust the file without hashing"""
+    if not digest:
+        return
+    stat = os.stat(path)
+    create_json(path + ".verified", {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "digest": digest,
+    })
+
+
+def verified_file(path: str, size: int, digest: str | None) -> bool:
+    """Check existing file with size and digest"""
+    if not os.path.isfile(path) or os.path.getsize(path) != size:
+        return False
+    if not digest:
+        return True
+
+    stat = os.stat(path)
+    recordFile = path + ".verified"
+    if os.path.isfile(recordFile):
+        with open(recordFile, "r") as f:
+            record = json.load(f)
+        if record == {"size": stat.st_size, "mtime": stat.st_mtime_ns, "digest": digest}:
+            return True
+
+    # not verified yet, hash local file once
+    if file_hasher(path, digest).hexdigest() != digest:
+        print(f"\n{os.path.basename(path)} is corrupted, digest does not match!")
+        return False
 
+    write_verified(path, digest)
     return True
 
 
-def test_or(str: str, osProc: str, osver: str, langs: list[str]) -> bool:
-    """Check OR (||) test result"""
-    conds = str.split("||")
-    for c in conds:
-        if "OSProcessorFamily" in c:
-            if do_test(c, osProc) is True:
-                return True
+def part_offset(partFile: str, length: int) -> int:
+    """Get resumable size of unfinished download"""
+    stateFile = partFile + ".json"
+    if os.path.isfile(stateFile):
+        # preallocated by segmented download, size is not progress
+        os.remove(stateFile)
+        return 0
 
-        if "OSVersion" in c:
-            if do_test(c, osver) is True:
-                return True
+    if not os.path.isfile(partFile):
+        return 0
 
-        if "installLanguage" in c:
-            if "all" in langs:
-                return True
+    offset = os.path.getsize(partFile)
+    if length and offset >= length:
+        return 0
 
-            if do_test(c, langs) is True:
-                return True
+    return offset
 
-    return False
 
+def range_request(url: str, start: int, end: int) -> requests.Response:
+    """Request a byte range of file"""
+    headers = ADOBE_REQ_HEADERS.copy()
+    headers["Range"] = f"bytes={start}-{end}"
+
+    response = session.get(url, stream=True, headers=headers)
+    response.raise_for_status()
+    return response
+
+
+def download_range(url: str, destDir: str, start: int, end: int, pBar, response=None) -> None:
+    """Download a byte range into preallocated file"""
+    if response is None:
+        response = range_request(url, start, end)
+
+    if response.status_code != 206:
+        raise requests.exceptions.HTTPError(
+            f"Range request is not supported ({response.status_code})")
+
+    with open(destDir, "r+b") as file:
+        file.seek(start)
+        written = stream_to_file(response, file, pBar)
+
+    if written != end - start + 1:
+        raise IOError(f"Incomplete segment {start}-{end}")
+
+
+def segmented_download(url: str, destDir: str, length: int, pBar) -> requests.Response | None:
+    """Download a file with multiple connections, return full response if server ignores ranges"""
+    step = -(-length // cfg["segments"])
+    ranges = [(s, min(s + step, length) - 1) for s in range(0, length, step)]
+
+    # finished segments of previous run
+    stateFile = destDir + ".json"
+    done = []
+    if os.path.isfile(stateFile) and os.path.isfile(destDir):
+        with open(stateFile, "r") as f:
+            state = json.load(f)
+        if state.get("length") == length:
+            done = [tuple(r) for r in state["done"] if tuple(r) in ranges]
+
+    pending = [r for r in ranges if r not in done]
+    if not pending:
+        os.remove(stateFile)
+        return None
+
+    # first range request tells whether server supports ranges
+    probe = range_request(url, *pending[0])
+    if probe.status_code != 206:
+        if os.path.isfile(stateFile):
+            os.remove(stateFile)
+        return probe
+
+    if done:
+        print(f"\nResuming {os.path.basename(url)}, {len(done)} of {len(ranges)} parts done")
+        pBar.resume(sum(end - start + 1 for start, end in done))
+    else:
+        # preallocate file, segments are written in place
+        with open(destDir, "wb") as file:
+            file.truncate(length)
 
-def condition_filter(pkgJson: dict, langs: list[str]) -> dict:
-    """Filter packages by condition statements"""
-    osver = cfg["osVersion"]
-    osProc = "64-bit"
-    if cfg["reqAppPlatform"] == "win32":
-        osProc = "32-bit"
+    create_json(stateFile, {"length": length, "done": done})
 
-    packages = pkgJson["Packages"]["Package"]
+    with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+        futures = {}
+        for start, end in pending:
+            response = probe if (start, end) == pending[0] else None
+            futures[pool.submit(download_range, url, destDir,
+                                start, end, pBar, response)] = (start, end)
 
-    newPkgs = []
-    for pkg in packages:
-        # append_file("conditions.txt", pkg.get("Condition"))
-        # continue
+        errors = []
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            done.append(futures[future])
+            create_json(stateFile, {"length": length, "done": done})
+
+    if errors:
+        # keep state file to resume on next run
+        raise errors[0]
+
+    os.remove(stateFile)
+    return None
 
-        if "Condition" in pkg:
-            conds = pkg.get("Condition")
-            if "||" in conds:
-                if test_or(conds, osProc, osver, langs) == True:
-                    newPkgs.append(pkg)
-            else:
-                if test_and(conds, osProc, osver, langs) == True:
-                    newPkgs.append(pkg)
 
-        # premiere pro/media encoder
-        elif "-esl_lp_" in pkg["PackageName"]:
-            if "all" in langs or "mul" in langs:
-                newPkgs.append(pkg)
+def download_icons(prodInfo: list) -> None:
+    """Download product icons"""
+    print("\nDownloading product icons...\n")
+
+    iconsDir = os.path.join(cfg["productDir"], "icons")
+    os.makedirs(iconsDir, exist_ok=True)
+
+    icons = prodInfo["productIcons"]
+    prefix = prodInfo["sapCode"].lower()
+
+    for url in icons:
+        download_file(url, iconsDir, prefix)
+
+
+def trim_languages(node, langs: set[str]):
+    """Trim Language lists to langs, only changed dicts and lists are copied"""
+    if isinstance(node, dict):
+        newNode = None
+        for k, v in node.items():
+            if k == "Language" and v and isinstance(v, list):
+                trimmed = [lc for lc in v if lc["locale"] in langs]
+                if len(trimmed) == len(v):
+                    trimmed = v
             else:
-                app, pproLang = pkg["PackageName"].split("-")
-                pproLang = pproLang.replace("esl_lp_", "")
-                for l in langs:
-                    main, locale = l.split("_")
-                    if main == pproLang:
-                        newPkgs.append(pkg)
-                    # for china languages
-                    if main == "zh":
-                        if pproLang == "cmn" or pproLang == "yue":
-                            newPkgs.append(pkg)
+                trimmed = trim_languages(v, langs)
+
+            if trimmed is not v:
+                if newNode is None:
+                    newNode = dict(node)
+                newNode[k] = trimmed
+        return node if newNode is None else newNode
+
+    if isinstance(node, list):
+        newNode = None
+        for i, v in enumerate(node):
+            trimmed = trim_languages(v, langs)
+            if trimmed is not v:
+                if newNode is None:
+                    newNode = list(node)
+                newNode[i] = trimmed
+        return node if newNode is None else newNode
+
+    return node
+
+
+CONDITION_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<=": operator.le,
+    ">=": operator.ge,
+    "<": operator.lt,
+    ">": operator.gt,
+}
 
+CONDITION_TOKEN = re.compile(r"""
+    \s*(?:
+        \[(?P<var>[^\]]+)\]
+        |(?P<op>==|!=|<=|>=|<|>)
+        |(?P<logic>&&|\|\||!|\(|\))
+        |["'](?P<str>[^"']*)["']
+        |(?P<val>[^\s()&|=!<>\[\]"']+)
+    )""", re.VERBOSE)
+
+
+def condition_tokens(cond: str) -> list[tuple[str, str]]:
+    """Split condition string to (kind, text) tokens"""
+    tokens = []
+    pos = 0
+    cond = cond.rstrip()
+    while pos < len(cond):
+        m = CONDITION_TOKEN.match(cond, pos)
+        if m is None:
+            raise ValueError(f"Unexpected text at {pos}: {cond[pos:]}")
+        kind = m.lastgroup
+        text = m.group(kind)
+        if kind == "str":
+            kind = "val"
+        elif kind == "logic":
+            kind = text
+        tokens.append((kind, text))
+        pos = m.end()
+    return tokens
+
+
+def parse_condition(cond: str) -> tuple:
+    """Parse condition string to tree of ("or"|"and", items), ("not", item) and ("cmp", var, op, value)"""
+    tokens = condition_tokens(cond)
+    pos = 0
+
+    def peek() -> str | None:
+        return tokens[pos][0] if pos < len(tokens) else None
+
+    def take(kind: str) -> str:
+        nonlocal pos
+        if peek() != kind:
+            raise ValueError(f"Expected {kind} in condition: {cond}")
+        pos += 1
+        return tokens[pos - 1][1]
+
+    def either(kind: str, item) -> tuple:
+        items = [item()]
+        while peek() == kind:
+            take(kind)
+            items.append(item())
+        return items[0] if len(items) == 1 else (kind, items)
+
+    def unary() -> tuple:
+        if peek() == "!":
+            take("!")
+            return ("not", unary())
+        if peek() == "(":
+            take("(")
+            node = either("||", lambda: either("&&", unary))
+            take(")")
+            return node
+        var = take("var")
+        op = take("op")
+        return ("cmp", var, op, take("val"))
+
+    tree = either("||", lambda: either("&&", unary))
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected {tokens[pos][1]} in condition: {cond}")
+    return tree
+
+
+def version_tuple(version: str) -> tuple[int, ...]:
+    """Version string to tuple of numbers"""
+    return tuple(int(p) if p.isdigit() else 0 for p in version.split("."))
+
+
+def compile_node(node: tuple):
+    """Compile condition tree to function of values, result is None for unknown values"""
+    kind = node[0]
+    if kind == "cmp":
+        _, var, op, value = node
+        opt = CONDITION_OPS[op]
+        if var == "OSVersion":
+            want = version_tuple(value)
+
+            def test(env):
+                have = env.get("OSVersion")
+                if have is None:
+                    return None
+                # missing parts are zero, 10.0 == 10.0.0
+                size = max(len(have), len(want))
+                return opt(have + (0,) * (size - len(have)), want + (0,) * (size - len(want)))
+        elif var == "installLanguage":
+            def test(env):
+                langs = env.get("installLanguage")
+                if langs is None:
+                    return None
+                # every language, unknown like a missing value so ! keeps it too
+                if "all" in langs:
+                    return None
+                found = value in langs
+                return found if op == "==" else not found if op == "!=" else None
         else:
-            newPkgs.append(pkg)
+            def test(env):
+                have = env.get(var)
+                if have is None:
+                    return None
+                return opt(have, value)
+        return test
+
+    if kind == "not":
+        inner = compile_node(node[1])
+
+        def test(env):
+            result = inner(env)
+            return None if result is None else not result
+        return test
+
+    # unknown stays unknown unless a known value decides the result
+    items = [compile_node(n) for n in node[1]]
+    if kind == "&&":
+        def test(env):
+            result = True
+            for t in items:
+                r = t(env)
+                if r is False:
+                    return False
+                if r is None:
+                    result = None
+            return result
+    else:
+        def test(env):
+            result = False
+            for t in items:
+                r = t(env)
+                if r is True:
+                    return True
+                if r is None:
+                    result = None
+            return result
+    return test
+
+
+@lru_cache(maxsize=None)
+def compile_condition(cond: str):
+    """Compile condition string once, None if it cannot be parsed"""
+    try:
+        return compile_node(parse_condition(cond))
+    except ValueError as err:
+        print(f"\nCannot read package condition, package is kept: {err}")
+        return None
+
 
-    pkgJson["Packages"]["Package"] = newPkgs
+def test_condition(cond: str, env: dict) -> bool:
+    """Check condition for install target, unknown values do not remove packages"""
+    test = compile_condition(cond)
+    if test is None:
+        return True
+    return test(env) is not False
 
-    return pkgJson
+
+def condition_env(langs: list[str], osVersion: str | None = None) -> dict:
+    """Values for package conditions of install target"""
+    osProc = "64-bit"
+    if cfg["reqAppPlatform"] == "win32":
+        osProc = "32-bit"
+    return {
+        "OSProcessorFamily": osProc,
+        "OSVersion": version_tuple(osVersion or cfg["osVersion"]),
+        "installLanguage": langs,
+    }
 
 
-def module_filter(pkgJson: dict) -> dict:
-    """Rebuild module for selected packages"""
-    if "Modules" in pkgJson:
-        packageNames = []
-        for names in pkgJson["Packages"]["Package"]:
-            packageNames.append(names["PackageName"])
+def keep_package(pkg: dict, env: dict, langs: list[str]) -> bool:
+    """Check package conditions and languages"""
+    if "Condition" in pkg:
+        return test_condition(pkg["Condition"], env)
 
-        allModules = pkgJson["Modules"]["Module"]
-        newModules = []
-        for module in allModules:
-            refPackage = module["ReferencePackages"]["ReferencePackage"]
-            for names in refPackage:
-                if names in packageNames:
-                    newModules.append(module)
+    # premiere pro/media encoder
+    if "-esl_lp_" in pkg["PackageName"]:
+        if "all" in langs or "mul" in langs:
+            return True
+        pproLang = pkg["PackageName"].split("-esl_lp_", 1)[1]
+        for l in langs:
+            main = l.split("_")[0]
+            if main == pproLang:
+                return True
+            # for china languages
+            if main == "zh" and pproLang in ("cmn", "yue"):
+                return True
+        return False
 
-        pkgJson["Modules"]["Module"] = newModules
-    return pkgJson
+    return True
 
 
-def get_package_url(pkgJson: dict) -> list[str]:
-    """Get package count and download url"""
+def get_package_url(pkgJson: dict) -> list[dict]:
+    """Get package count, download url and size"""
     count = core = 0
     pkgUrl = []
     for pkg in pkgJson["Packages"]["Package"]:
         count += 1
-        pkgUrl.append(pkg["Path"])
+        pkgUrl.append({
+            "path": pkg["Path"],
+            "size": int(pkg.get("DownloadSize") or 0),
+            "extract": int(pkg.get("ExtractSize") or 0),
+            "digest": package_digest(pkg),
+            "core": pkg.get("Type") == "core",
+        })
         if pkg.get("Type") == "core":
             core += 1
 
@@ -949,46 +2612,506 @@ def get_package_url(pkgJson: dict) -> list[str]:
 
 def package_filter(pkgJson: dict, lang: list[str]):
     """Filter and rebuild packages by conditions and languages"""
+    return matrix_filter(pkgJson, [(lang, condition_env(lang))])[0]
+
+
+def matrix_filter(pkgJson: dict, targets: list[tuple[list[str], dict]]) -> list[tuple[dict, list[dict]]]:
+    """Filter packages for (languages, condition values) targets in one pass"""
+    # filter by conditions string, keep names for modules
+    kept = [([], set()) for _ in targets]
+    for pkg in pkgJson["Packages"]["Package"]:
+        for (lang, env), (packages, packageNames) in zip(targets, kept):
+            if keep_package(pkg, env, lang):
+                packages.append(pkg)
+                packageNames.add(pkg["PackageName"])
+
+    results = []
+    for (lang, env), (packages, packageNames) in zip(targets, kept):
+        langs = None
+        if "mul" not in lang and "all" not in lang:
+            langs = set(lang) | {"mul"}
+
+        # result shares unchanged parts with source json
+        newJson = {}
+        for k, v in pkgJson.items():
+            if k == "Packages":
+                v = dict(v, Package=packages)
+            elif k == "Modules":
+                # filter unused module
+                v = dict(v, Module=[
+                    m for m in v["Module"]
+                    if not packageNames.isdisjoint(m["ReferencePackages"]["ReferencePackage"])
+                ])
+            # filter unused languages data
+            newJson[k] = v if langs is None else trim_languages(v, langs)
+
+        # get package urls
+        results.append((newJson, get_package_url(newJson)))
+
+    return results
 
-    # filter unused languages data
-    pkgJson = language_filter(pkgJson, lang)
 
-    # filter by conditions string
-    pkgJson = condition_filter(pkgJson, lang)
+def store_key(task: dict) -> str:
+    """Get content key of package in shared store"""
+    key = "{}:{}".format(os.path.basename(task["url"]), task["size"])
+    if task["digest"]:
+        key += ":" + task["digest"]
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
 
-    # filter unused module
-    pkgJson = module_filter(pkgJson)
 
-    # get package urls
-    pkgUrl = get_package_url(pkgJson)
+def store_file(task: dict) -> str:
+    """Get path of package in shared store"""
+    key = store_key(task)
+    return os.path.join(cfg["store"], key[:2], key + "-" + os.path.basename(task["url"]))
 
-    return pkgJson, pkgUrl
 
+def link_file(src: str, dst: str) -> None:
+    """Hardlink file from shared store, copy it if linking is not possible"""
+    if os.path.isfile(dst):
+        if os.path.samefile(src, dst):
+            return
+        os.remove(dst)
 
-def package_download(url: str, destDir: str, code: str, ver: str, name=None) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        # other volume or file system without hardlinks
+        shutil.copyfile(src, dst)
+
+
+def package_download(task: dict) -> bool:
+    """Download a product package, counted in metrics"""
+    stats = transfer_start(task)
+    done = False
+    try:
+        done = package_transfer(task)
+    finally:
+        transfer_end(stats, done)
+    return done
+
+
+def package_transfer(task: dict) -> bool:
     """Download a product package"""
-    if not name:
-        name = os.path.basename(url)
-    print("\n[{}_{}] Downloading {}".format(code, ver, name))
-    download_file(url, destDir)
+    name = transfer_name(task)
+    storeFile = transfer_store(task)
+    if storeFile is None:
+        return download_file(task["url"], task["pkgDir"], size=task["size"], digest=task["digest"])
 
+    with storeLock:
+        keyLock = storeKeyLocks.setdefault(storeFile, threading.Lock())
 
-def get_appjson(prodInfo: list) -> dict:
-    """Download package json file"""
+    with keyLock:
+        target = store_target(task, storeFile)
+        if target is not None and not download_file(task["url"], *target, task["size"], task["digest"]):
+            return False
+
+    link_file(storeFile, os.path.join(task["pkgDir"], name))
+    return True
+
+
+def transfer_name(task: dict) -> str:
+    """Show package download, get package file name"""
+    name = os.path.basename(task["url"])
+    print("\n[{}_{}] Downloading {}".format(
+        task["sapCode"], task["version"], name))
+    return name
+
+
+def transfer_store(task: dict) -> str | None:
+    """Get store file of package, None if it is downloaded to products folder"""
+    # without size package cannot be addressed in store
+    if not cfg["store"] or not task["size"]:
+        return None
+    return store_file(task)
+
+
+def store_target(task: dict, storeFile: str) -> tuple[str, str] | None:
+    """Get store folder and file prefix to download package, None if it is in store"""
+    name = os.path.basename(task["url"])
+    if verified_file(storeFile, task["size"], task["digest"]):
+        print(f"\nFound {name} in store")
+        count_metric("storeHits")
+        return None
+
+    storeDir, storeName = os.path.split(storeFile)
+    os.makedirs(storeDir, exist_ok=True)
+    return storeDir, storeName[:-len(name)]
+
+
+def run_downloads(tasks: list[dict]) -> list[dict]:
+    """Download packages, retry failed ones and return still failed tasks"""
+    global totalBar
+    with metricsLock:
+        # throughput is measured from first transfer
+        if not metrics["products"]:
+            metrics["started"] = time.time()
+
+    if cfg["progress"] == "total":
+        totalBar = tqdm(total=sum(t["size"] for t in tasks),
+                        unit="iB", unit_scale=True, desc="Total")
+
+    stop = threading.Event()
+    if cfg["metrics"] or cfg["promFile"]:
+        threading.Thread(target=metrics_reporter, args=(stop,), daemon=True).start()
+
+    try:
+        failed = download_tasks(schedule_tasks(tasks))
+        for attempt in range(cfg["retries"]):
+            if not failed:
+                break
+            print(f"\nRetrying {len(failed)} failed packages...")
+            count_metric("retries", len(failed))
+            failed = download_tasks(failed)
+    finally:
+        stop.set()
+        if totalBar is not None:
+            totalBar.close()
+            totalBar = None
+        report_metrics("summary")
+
+    return failed
+
+
+def schedule_tasks(tasks: list[dict]) -> list[dict]:
+    """Order downloads, core packages first and then largest first"""
+    # biggest packages start early and don't run alone at the end
+    return sorted(tasks, key=lambda t: (not t["core"], -t["size"]))
+
+
+def download_tasks(tasks: list[dict]) -> list[dict]:
+    """Download packages with a worker pool, return failed tasks"""
+    if cfg["engine"] == "asyncio":
+        return run_async(async_run_downloads(tasks))
+
+    failed = []
+    if cfg["jobs"] <= 1:
+        for task in tasks:
+            if not package_download(task):
+                failed.append(task)
+        return failed
+
+    pool = ThreadPoolExecutor(max_workers=cfg["jobs"])
+    try:
+        futures = {pool.submit(package_download, t): t for t in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                done = future.result()
+            except Exception as e:
+                print(f"An unexpected error occurred! {e}")
+                done = False
+
+            if not done:
+                failed.append(task)
+    except KeyboardInterrupt:
+        # don't wait for queued packages
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    return failed
+
+
+def run_async(coro):
+    """Run coroutine on the shared event loop"""
+    global eventLoop
+    if eventLoop is None:
+        eventLoop = asyncio.new_event_loop()
+    return eventLoop.run_until_complete(coro)
+
+
+async def get_aio_session() -> "aiohttp.ClientSession":
+    """Get http session of asyncio engine"""
+    global aioSession
+    if aioSession is None:
+        aioSession = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=cfg["jobs"]),
+            trace_configs=[aio_trace_config()],
+            # large packages may take long, only limit idle reads
+            timeout=aiohttp.ClientTimeout(total=None, sock_read=300),
+        )
+    return aioSession
+
+
+def aio_trace_config() -> "aiohttp.TraceConfig":
+    """Count requests of asyncio engine in metrics"""
+    trace = aiohttp.TraceConfig()
+
+    async def on_start(client, ctx, params) -> None:
+        ctx.start = time.monotonic()
+
+    async def on_end(client, ctx, params) -> None:
+        record_request(str(params.url), time.monotonic() - ctx.start, params.response.status)
+
+    trace.on_request_start.append(on_start)
+    trace.on_request_end.append(on_end)
+    return trace
+
+
+async def close_aio_session() -> None:
+    """Close http session of asyncio engine"""
+    global aioSession
+    if aioSession is not None:
+        await aioSession.close()
+        aioSession = None
+
+
+async def async_download_data(url: str, header: dict) -> bytes:
+    """Get raw data with asyncio engine"""
+    client = await get_aio_session()
+    try:
+        async with client.get(url, headers=header) as response:
+            response.raise_for_status()
+
+            total_size = int(response.headers.get("content-length", 0))
+            mem_file = io.BytesIO()
+            with tqdm(total=total_size or None, unit="B", unit_scale=True, unit_divisor=1024,
+                      disable=cfg["progress"] != "file") as pbar:
+                async for chunk in response.content.iter_chunked(read_size()):
+                    mem_file.write(chunk)
+                    pbar.update(len(chunk))
+                    await asyncio.sleep(throttle_delay(len(chunk), url))
+
+            downData = mem_file.getvalue()
+            mem_file.close()
+
+    except aiohttp.ClientResponseError as err_h:
+        print(f"Connection error occurred: {err_h}")
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as err_r:
+        print(f"Unexpected error occurred: {err_r}")
+
+    else:
+        return downData
+
+    # exit on download error
+    sys.exit("\nCannot download data!")
+
+
+async def async_download_file(url: str, dest: str, prefix=None, size: int = 0, digest: str | None = None) -> bool:
+    """Download package file with asyncio engine"""
+    filename, destDir, partFile = download_paths(url, dest, prefix)
+
+    # check existing file without asking server
+    if cfg["skip"] and size and verified_file(destDir, size, digest):
+        print(f"\nDownloaded file seems OK, skipping...")
+        return True
+
+    client = await get_aio_session()
+    loop = asyncio.get_running_loop()
+    try:
+        offset, headers = resume_headers(partFile, size, filename)
+
+        response = await client.get(url, headers=headers)
+        if response.status == 416:
+            # part file is not smaller than the file
+            response.release()
+            offset = 0
+            response = await client.get(url, headers=ADOBE_REQ_HEADERS)
+
+        async with response:
+            response.raise_for_status()
+
+            offset, mode = response_offset(response.status, offset)
+
+            lengthInBytes = offset + \
+                int(response.headers.get("content-length", 0))
+
+            if existing_download(destDir, size, lengthInBytes):
+                return True
+
+            # digest is updated while writing, resumed part is read once
+            hasher = None
+            if digest:
+                hasher = file_hasher(partFile, digest, offset)
+
+            def write(file, data: bytes) -> None:
+                file.write(data)
+                if hasher is not None:
+                    hasher.update(data)
+
+            written = offset
+            with PackageBar(lengthInBytes, offset) as pBar:
+                with open(partFile, mode) as file:
+                    async for data in response.content.iter_chunked(read_size()):
+                        # keep disk writes off the event loop
+                        await loop.run_in_executor(None, write, file, data)
+                        pBar.update(len(data))
+                        written += len(data)
+                        await asyncio.sleep(throttle_delay(len(data), url))
+
+        return finish_download(partFile, destDir, written, lengthInBytes, size, digest, hasher)
+    except Exception as e:
+        print(f"An unexpected error occurred! {e}")
+
+    return False
+
+
+async def async_run_downloads(tasks: list[dict]) -> list[dict]:
+    """Download packages on the event loop, return failed tasks"""
+    limit = asyncio.Semaphore(cfg["jobs"])
+    keyLocks = {}
+
+    async def package(task: dict) -> bool:
+        async with limit:
+            stats = transfer_start(task)
+            done = False
+            try:
+                done = await package_transfer(task)
+            finally:
+                transfer_end(stats, done)
+            return done
+
+    async def package_transfer(task: dict) -> bool:
+        name = transfer_name(task)
+        storeFile = transfer_store(task)
+        if storeFile is None:
+            return await async_download_file(task["url"], task["pkgDir"], size=task["size"], digest=task["digest"])
+
+        async with keyLocks.setdefault(storeFile, asyncio.Lock()):
+            target = store_target(task, storeFile)
+            if target is not None and not await async_download_file(task["url"], *target, task["size"], task["digest"]):
+                return False
+
+        link_file(storeFile, os.path.join(task["pkgDir"], name))
+        return True
+
+    results = await asyncio.gather(*[package(t) for t in tasks])
+    return [task for task, done in zip(tasks, results) if not done]
+
+
+def appjson_guid(prodInfo: dict) -> str:
+    """Get build guid of product"""
     if "appType" in prodInfo and prodInfo["appType"] == "dep":
         dep_data = list(prodInfo["versions"].values())
         firstItem = dep_data[0]
-        appGuid = firstItem["buildGuid"]
-    else:
-        appGuid = prodInfo["buildGuid"]
+        return firstItem["buildGuid"]
+    return prodInfo["buildGuid"]
 
-    """Retrieve JSON."""
+
+def appjson_headers(appGuid: str) -> dict:
+    """Request headers for Application.json of build guid"""
     headers = ADOBE_REQ_HEADERS.copy()
     headers["x-adobe-build-guid"] = appGuid
+    return headers
+
+
+def get_appjson(prodInfo: list) -> dict:
+    """Download package json file"""
+    appGuid = appjson_guid(prodInfo)
+    with trace_span("appjson", "metadata", sapCode=prodInfo["sapCode"]) as span:
+        appJsonData = cached_appjson(appGuid)
+        span["cached"] = appJsonData is not None
+        if appJsonData is not None:
+            return appJsonData
+
+        print("\nDownloading Application.json file ...")
+        count_metric("appJsonDownloaded")
+        jsonData = download_data(ADOBE_APPLICATION_JSON_URL, appjson_headers(appGuid))
+        save_appjson(appGuid, jsonData)
+
+        return json.loads(jsonData.decode("utf-8"))
+
+
+async def async_get_appjson(prodInfo: dict) -> dict:
+    """Download package json file with asyncio engine"""
+    appGuid = appjson_guid(prodInfo)
+    with trace_span("appjson", "metadata", sapCode=prodInfo["sapCode"]) as span:
+        appJsonData = cached_appjson(appGuid)
+        span["cached"] = appJsonData is not None
+        if appJsonData is not None:
+            return appJsonData
+
+        print("\nDownloading Application.json file ...")
+        count_metric("appJsonDownloaded")
+        jsonData = await async_download_data(ADOBE_APPLICATION_JSON_URL, appjson_headers(appGuid))
+        save_appjson(appGuid, jsonData)
+
+        return json.loads(jsonData.decode("utf-8"))
+
+
+def get_appjsons(prodInfos: list[dict]) -> list[dict]:
+    """Download json files of products at the same time"""
+    if cfg["engine"] == "asyncio":
+        return run_async(async_get_appjsons(prodInfos))
+
+    if len(prodInfos) < 2:
+        return [get_appjson(p) for p in prodInfos]
 
-    print("\nDownloading Application.json file ...")
-    #fileName = prodInfo["sapCode"] + "_Application.json"
-    return download_json(ADOBE_APPLICATION_JSON_URL, headers)
+    with ThreadPoolExecutor(max_workers=min(len(prodInfos), METADATA_JOBS)) as executor:
+        return list(executor.map(get_appjson, prodInfos))
+
+
+async def async_get_appjsons(prodInfos: list[dict]) -> list[dict]:
+    """Download json files of products with asyncio engine"""
+    return await asyncio.gather(*(async_get_appjson(p) for p in prodInfos))
+
+
+def cached_appjson(appGuid: str) -> dict | None:
+    """Get Application.json of build guid from cache"""
+    # json of a build never changes
+    cacheFile = appjson_cache_file(appGuid)
+    if not cacheFile or not os.path.isfile(cacheFile):
+        return None
+
+    try:
+        with open(cacheFile, "r") as f:
+            appJsonData = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    print("\nUsing cached Application.json file ...")
+    count_metric("appJsonCached")
+    # recently used files are removed last
+    os.utime(cacheFile)
+    return appJsonData
+
+
+def save_appjson(appGuid: str, jsonData: bytes) -> None:
+    """Save downloaded Application.json to cache"""
+    cacheFile = appjson_cache_file(appGuid)
+    if not cacheFile:
+        return
+
+    with open(cacheFile + ".part", "wb") as f:
+        f.write(jsonData)
+    os.replace(cacheFile + ".part", cacheFile)
+    prune_cache(os.path.dirname(cacheFile), cfg["appJsonCache"])
+
+
+def appjson_cache_file(appGuid: str | None) -> str | None:
+    """Get cache file of Application.json for build guid"""
+    if not appGuid or not cfg["appJsonCache"]:
+        return None
+
+    cacheDir = os.path.join(cfg["cacheDir"], "appjson")
+    os.makedirs(cacheDir, exist_ok=True)
+    name = appGuid
+    if not re.fullmatch(r"[\w-]+", name):
+        name = hashlib.sha1(appGuid.encode("utf-8")).hexdigest()
+    # mirror sends its own filtered json with its address, keep servers apart
+    host = urlsplit(ADOBE_APPLICATION_JSON_URL).netloc
+    name += "-" + hashlib.sha1(host.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(cacheDir, name + ".json")
+
+
+def prune_cache(cacheDir: str, maxSize: int) -> None:
+    """Remove least recently used files until cache fits in max size"""
+    files = []
+    for entry in os.scandir(cacheDir):
+        if entry.is_file() and entry.name.endswith(".json"):
+            st = entry.stat()
+            files.append((st.st_mtime, st.st_size, entry.path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= maxSize:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
 
 
 def xml_langs_list(langRoot, langList):
@@ -1083,22 +3206,108 @@ def write_driver_xml(pkgJson: dict, pkgDir: str, reqLang: list[str]) -> None:
     tree.write(xml_file, encoding="utf-8", xml_declaration=True)
 
 
-def product_download(prodInfo: list, allProducts: dict, reqLang: list) -> None:
-    """Download product related packages"""
-    sapCode = prodInfo["sapCode"]
+def version_info(prodInfo: dict) -> dict:
+    """Get version data of product"""
+    if "versions" in prodInfo:
+        # dependency, same version as get_appjson uses
+        prodInfo = list(prodInfo["versions"].values())[0]
+    return prodInfo
+
+
+def node_key(prodInfo: dict) -> tuple[str, str]:
+    """Get graph key (SAP code, version) of product"""
+    prodInfo = version_info(prodInfo)
+    return prodInfo["sapCode"], prodInfo["productVersion"]
+
+
+def resolve_products(roots: list[tuple[dict, list]], allProducts: dict) -> OrderedDict:
+    """Resolve requested products and dependencies to one graph"""
+    graph = OrderedDict()
+    level = [(prodInfo, True) for prodInfo, langs in roots]
+    while level:
+        # products found on this level, json files are downloaded together
+        fetch = OrderedDict()
+        for prodInfo, isRoot in level:
+            key = node_key(prodInfo)
+            if key in graph:
+                # shared dependency, fetched once
+                graph[key]["root"] = graph[key]["root"] or isRoot
+            elif key in fetch:
+                fetch[key] = (fetch[key][0], fetch[key][1] or isRoot)
+            else:
+                fetch[key] = (prodInfo, isRoot)
+
+        with trace_span("appjson level", "metadata", products=len(fetch)):
+            appJsons = get_appjsons([prodInfo for prodInfo, _ in fetch.values()])
+
+        level = []
+        with trace_span("dependencies", profile=True):
+            for (key, (prodInfo, isRoot)), appJsonData in zip(fetch.items(), appJsons):
+                deps = []
+                if "Dependencies" in appJsonData:
+                    for dependency in appJsonData["Dependencies"]["Dependency"]:
+                        depSap = dependency["SAPCode"]
+                        depPackage = allProducts.get(depSap)
+                        if depPackage is None:
+                            print(f"\nDependency {depSap} is not available!")
+                            continue
+
+                        deps.append(node_key(depPackage))
+                        level.append((depPackage, False))
+
+                graph[key] = {
+                    "prodInfo": prodInfo,
+                    "appJson": appJsonData,
+                    "deps": deps,
+                    "root": isRoot,
+                    "langs": [],
+                }
+
+    # dependency packages for languages of every product using it
+    for prodInfo, langs in roots:
+        for key in graph_walk(graph, node_key(prodInfo)):
+            for l in langs:
+                if l not in graph[key]["langs"]:
+                    graph[key]["langs"].append(l)
+
+    print(f"\n{len(graph)} products to download.")
+
+    return graph
+
+
+def graph_walk(graph: OrderedDict, key: tuple[str, str]) -> list[tuple[str, str]]:
+    """Get product and all of its dependencies"""
+    seen = []
+    pending = [key]
+    while pending:
+        key = pending.pop()
+        if key in seen or key not in graph:
+            continue
+        seen.append(key)
+        pending.extend(graph[key]["deps"])
+    return seen
 
-    # create product packages dir
-    pkgDir = os.path.join(cfg['productDir'], sapCode)
-    os.makedirs(pkgDir, exist_ok=True)
 
-    appJsonData = get_appjson(prodInfo)
+def prepare_product(node: dict, allProducts: dict) -> list[dict]:
+    """Filter packages, create product files and get download tasks"""
+    sapCode = node["prodInfo"]["sapCode"]
+    reqLang = node["langs"]
+    pkgDir = os.path.join(cfg['productDir'], sapCode)
 
     # filter out unused packages and resource urls
-    appJsonData, urls = package_filter(appJsonData, reqLang)
+    appJsonData, urls = package_filter(node["appJson"], reqLang)
 
     # download packages
     cdn = appJsonData["Cdn"]["Secure"]
     version = appJsonData["ProductVersion"]
+    tasks = [package_task(node, cdn + url["path"], url, pkgDir, version) for url in urls]
+
+    # plan only, product files are not created
+    if cfg["plan"]:
+        return tasks
+
+    # create product packages dir
+    os.makedirs(pkgDir, exist_ok=True)
 
     if allProducts[sapCode]["appType"] == "app":
         if appJsonData.get("AddRemoveInfo"):
@@ -1114,36 +3323,474 @@ def product_download(prodInfo: list, allProducts: dict, reqLang: list) -> None:
     print("\nCreating Application.json file...")
     create_json(os.path.join(pkgDir, "Application.json"), appJsonData)
 
-    for url in urls:
-        url = cdn + url
+    return tasks
 
-        package_download(url, pkgDir, sapCode, version)
 
-    if "Dependencies" in appJsonData:
-        print("\nDownloading dependency packages...")
-        for dependency in appJsonData["Dependencies"]["Dependency"]:
-            depSap = dependency["SAPCode"]
-            depPackage = allProducts.get(depSap)
+def package_task(node: dict, url: str, pkg: dict, pkgDir: str, version: str) -> dict:
+    """Get download task of package"""
+    return {
+        "url": url,
+        "pkgDir": pkgDir,
+        "sapCode": node["prodInfo"]["sapCode"],
+        "version": version,
+        "size": pkg["size"],
+        "extract": pkg["extract"],
+        "digest": pkg["digest"],
+        "core": pkg["core"],
+        "node": node_key(node["prodInfo"]),
+    }
 
-            product_download(depPackage, allProducts, reqLang)
 
+def target_langs(node: dict, target: dict) -> list[str] | None:
+    """Get languages of target available for product, None if there are none"""
+    if node["prodInfo"].get("appType") == "dep":
+        return target["langs"]
 
-def download_acrobat(prodInfo, toDown):
-    """Download acrobat installer or updates"""
-    url = cfg['cdn'] + prodInfo["manifestURL"]
+    appLangs = node["prodInfo"]["supportedLanguages"]
+    if "all" in target["langs"] or "mul" in target["langs"]:
+        return ["all"]
+    langs = [l for l in target["langs"] if l in appLangs]
+    if not langs and ("mul" in appLangs or "all" in appLangs):
+        # for mul only apps (AME, etc)
+        langs = ["all"]
+    return langs or None
 
-    print("\nDownloading manifest.xml ...")
-    manifest = download_xml(url, ADOBE_REQ_HEADERS)
 
-    # check available products
-    assetList = manifest.findall("./asset_list/asset")
+def prepare_matrix(node: dict, allProducts: dict, targets: list[dict]) -> list[dict]:
+    """Filter packages for every target, create target files and get shared download tasks"""
+    sapCode = node["prodInfo"]["sapCode"]
+
+    usedTargets = []
+    for target in targets:
+        langs = target_langs(node, target)
+        if langs is None:
+            print(f"\n{sapCode} is not available in {target['name']} languages, skipped")
+            continue
+        usedTargets.append((target, langs))
+
+    results = matrix_filter(node["appJson"], [
+        (langs, condition_env(langs, target["osVersion"])) for target, langs in usedTargets])
+
+    # every package is downloaded once and linked to other targets
+    tasks = OrderedDict()
+    for (target, langs), (appJsonData, urls) in zip(usedTargets, results):
+        targetDir = os.path.join(cfg["productDir"], target["name"])
+        pkgDir = os.path.join(targetDir, sapCode)
+
+        # plan only, target files are not created
+        if not cfg["plan"]:
+            os.makedirs(pkgDir, exist_ok=True)
+
+            if allProducts[sapCode]["appType"] == "app":
+                print(f"\nCreating Driver.xml file for {target['name']}...")
+                write_driver_xml(appJsonData, targetDir, langs)
+
+            print(f"\nCreating Application.json file for {target['name']}...")
+            create_json(os.path.join(pkgDir, "Application.json"), appJsonData)
+
+        cdn = appJsonData["Cdn"]["Secure"]
+        for url in urls:
+            if url["path"] in tasks:
+                tasks[url["path"]]["links"].append(pkgDir)
+                continue
+            task = package_task(node, cdn + url["path"], url, pkgDir, appJsonData["ProductVersion"])
+            task["links"] = []
+            tasks[url["path"]] = task
+
+    print(f"\n{len(tasks)} packages of {sapCode} for {len(usedTargets)} targets")
+
+    return list(tasks.values())
+
+
+def product_download(roots: list[tuple[dict, list]], allProducts: dict) -> list[str]:
+    """Download products with dependencies, return failed products"""
+    # every product and dependency once for whole batch
+    with trace_span("resolve", products=len(roots)):
+        graph = resolve_products(roots, allProducts)
+
+    targets = [
+        t for t in cfg["targets"]
+        if t["platform"] in (None, cfg["reqAppPlatform"])
+    ]
+    if cfg["targets"] and not targets:
+        print("\nNo targets for {}".format(cfg["reqAppPlatform"]))
+        return []
+
+    tasks = []
+    for node in graph.values():
+        with trace_span("filter", profile=True, sapCode=node["prodInfo"]["sapCode"]):
+            if targets:
+                tasks += prepare_matrix(node, allProducts, targets)
+            else:
+                tasks += prepare_product(node, allProducts)
+
+    if cfg["plan"]:
+        with trace_span("plan", profile=True):
+            planReports.append(download_plan(graph, tasks))
+        return []
+
+    update_mirror_index(graph, targets)
+
+    with trace_span("transfer", "transfer", packages=len(tasks)):
+        failedTasks = run_downloads(tasks)
+    failedNodes = set()
+    for task in failedTasks:
+        print("\n[{}_{}] Failed to download {}".format(
+            task["sapCode"], task["version"], os.path.basename(task["url"])))
+        failedNodes.add(task["node"])
+
+    # packages shared by targets
+    failedIds = {id(task) for task in failedTasks}
+    for task in tasks:
+        if id(task) in failedIds:
+            continue
+        name = os.path.basename(task["url"])
+        for linkDir in task.get("links", ()):
+            link_file(os.path.join(task["pkgDir"], name), os.path.join(linkDir, name))
+
+    # product fails if any of its dependencies failed
+    failed = []
+    for key, node in graph.items():
+        if node["root"] and failedNodes.intersection(graph_walk(graph, key)):
+            failed.append(key[0])
+
+    return failed
+
+
+def package_present(task: dict) -> bool:
+    """Check if package is already downloaded, without hashing"""
+    name = os.path.basename(task["url"])
+    for path in (os.path.join(task["pkgDir"], name), store_file(task) if cfg["store"] else None):
+        if path and os.path.isfile(path) and os.path.getsize(path) == task["size"]:
+            return True
+    return False
+
+
+def download_plan(graph: OrderedDict, tasks: list[dict]) -> dict:
+    """Count download, extract, present and shared bytes of products"""
+    products = OrderedDict()
+    for key in graph:
+        products[key] = {
+            "sapCode": key[0],
+            "version": key[1],
+            "packages": 0,
+            "downloadSize": 0,
+            "extractSize": 0,
+            "presentSize": 0,
+            "sharedSize": 0,
+            "transferSize": 0,
+        }
+
+    for task in tasks:
+        entry = products[task["node"]]
+        # packages linked to other targets are not downloaded again
+        copies = 1 + len(task.get("links", ()))
+        entry["packages"] += copies
+        entry["downloadSize"] += task["size"] * copies
+        entry["extractSize"] += task["extract"] * copies
+        entry["sharedSize"] += task["size"] * (copies - 1)
+
+        # without store every products folder downloads its own copy
+        key = store_key(task) if transfer_store(task) else None
+        if package_present(task):
+            entry["presentSize"] += task["size"]
+        elif key in planKeys:
+            entry["sharedSize"] += task["size"]
+        else:
+            entry["transferSize"] += task["size"]
+        if key:
+            planKeys.add(key)
+
+    plan = {
+        "origin": cfg["origin"],
+        "products": list(products.values()),
+    }
+    for name in ("packages", "downloadSize", "extractSize", "presentSize", "sharedSize", "transferSize"):
+        plan[name] = sum(p[name] for p in plan["products"])
+
+    print_plan(plan)
+    return plan
+
+
+def print_plan(plan: dict) -> None:
+    """Show download plan as table"""
+    def size(n: int) -> str:
+        return tqdm.format_sizeof(n, "B", 1024)
+
+    columns = ("packages", "downloadSize", "extractSize", "presentSize", "sharedSize", "transferSize")
+    print("\n" + ("-" * 90))
+    print("Download plan for {}".format(plan.get("origin", "all")))
+    print("-" * 90)
+    print("{:<20}{:>10}{:>10}{:>10}{:>10}{:>10}{:>10}".format(
+        "Product", "Packages", "Download", "Extract", "Present", "Shared", "Transfer"))
+    for p in plan.get("products", []):
+        print("{:<20}{:>10}{:>10}{:>10}{:>10}{:>10}{:>10}".format(
+            f"{p['sapCode']} {p['version']}", p["packages"], *(size(p[c]) for c in columns[1:])))
+    print("{:<20}{:>10}{:>10}{:>10}{:>10}{:>10}{:>10}".format(
+        "Total", plan["packages"], *(size(plan[c]) for c in columns[1:])))
+
+
+def write_plan(reports: list[dict], planFile: str) -> None:
+    """Save download plans as json, - for console"""
+    columns = ("packages", "downloadSize", "extractSize", "presentSize", "sharedSize", "transferSize")
+    plan = {"origins": reports}
+    for name in columns:
+        plan[name] = sum(r[name] for r in reports)
+
+    if len(reports) > 1:
+        print_plan(plan)
+
+    if planFile == "-":
+        print(json.dumps(plan, indent=4), file=sys.__stdout__)
+    elif planFile:
+        create_json(planFile, plan)
+        print(f"\nDownload plan saved to {planFile}")
+
+
+def update_mirror_index(graph: OrderedDict, targets: list[dict]) -> None:
+    """Record build guids and folders of products for mirror mode"""
+    indexFile = os.path.join(cfg["productDir"], MIRROR_INDEX)
+    index = {}
+    if os.path.isfile(indexFile):
+        with open(indexFile, "r") as f:
+            index = json.load(f)
+
+    # targets have their own product folders
+    subDirs = [t["name"] for t in targets] or [""]
+    for node in graph.values():
+        info = version_info(node["prodInfo"])
+        if not info["buildGuid"]:
+            continue
+        dirs = [
+            "/".join(filter(None, (d, info["sapCode"]))) for d in subDirs
+            if os.path.isfile(os.path.join(cfg["productDir"], d, info["sapCode"], "Application.json"))
+        ]
+        if dirs:
+            index[info["buildGuid"]] = dirs
+
+    create_json(indexFile, index)
+
+
+def mirror_index(prodDir: str) -> dict:
+    """Get Application.json files by build guid and package paths of downloaded products"""
+    index = {"guids": {}, "packages": {}}
+
+    # url versions and platforms may have their own folders and index
+    for root, _, files in os.walk(prodDir):
+        if MIRROR_INDEX not in files:
+            continue
+
+        with open(os.path.join(root, MIRROR_INDEX), "r") as f:
+            guids = json.load(f)
+
+        for guid, dirs in guids.items():
+            # older index has sap code only
+            if isinstance(dirs, str):
+                dirs = [dirs]
+            for pkgDir in dirs:
+                pkgDir = os.path.join(root, *pkgDir.split("/"))
+                appJson = os.path.join(pkgDir, "Application.json")
+                if not os.path.isfile(appJson):
+                    continue
+                index["guids"].setdefault(guid, []).append(appJson)
+
+                with open(appJson, "r") as f:
+                    pkgJson = json.load(f)
+                for pkg in pkgJson["Packages"]["Package"]:
+                    index["packages"].setdefault(
+                        pkg["Path"], os.path.join(pkgDir, os.path.basename(pkg["Path"])))
+
+    return index
+
+
+class MirrorHandler(BaseHTTPRequestHandler):
+    """Serve catalog, Application.json and packages like Adobe servers"""
+    protocol_version = "HTTP/1.1"
+    prodDir = None
+    index = {"guids": {}, "packages": {}}
+    # catalogs with time they were read from cache
+    catalogs = {}
+    catalogLock = threading.Lock()
+    lock = threading.Lock()
+
+    def do_HEAD(self) -> None:
+        self.handle_request(head=True)
+
+    def do_GET(self) -> None:
+        self.handle_request(head=False)
+
+    def base_url(self) -> str:
+        """Address of mirror as client sees it"""
+        host = self.headers.get("Host") or "{}:{}".format(
+            *self.server.server_address[:2])
+        return f"http://{host}"
+
+    def handle_request(self, head: bool) -> None:
+        path = urlsplit(self.path).path
+        try:
+            if path == urlsplit(ADOBE_APPLICATION_JSON_URL).path:
+                self.send_appjson(head)
+            elif path.endswith("/products/all"):
+                self.send_catalog(head)
+            else:
+                self.send_package(path, head)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.log_error("Upstream error: %s", e)
+            self.send_error(502)
+
+    def send_data(self, data: bytes, ctype: str, head: bool) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(data)
+
+    def send_catalog(self, head: bool) -> None:
+        """Catalog from cache or Adobe, cdn is not changed (Acrobat is not in mirror)"""
+        # one refresh at a time, cache files are shared by all clients
+        with self.catalogLock:
+            entry = self.catalogs.get(self.path)
+            if entry is None or time.time() - entry[0] >= cfg["catalogTtl"]:
+                entry = (time.time(), self.mirror_catalog())
+                self.catalogs[self.path] = entry
+
+        self.send_data(entry[1], "application/xml", head)
+
+    def mirror_catalog(self) -> bytes:
+        """Get catalog through products list cache, use last cached one if Adobe is not reachable"""
+        url = urlsplit(ADOBE_PRODUCTS_XML_URL)
+        upstream = f"{url.scheme}://{url.netloc}{self.path}"
+        try:
+            return b"".join(cached_catalog(upstream))
+        except requests.exceptions.RequestException as e:
+            xmlFile, _ = catalog_files(upstream)
+            if not os.path.isfile(xmlFile):
+                raise
+            self.log_error("Upstream error, using cached catalog: %s", e)
+            with open(xmlFile, "rb") as f:
+                return f.read()
+
+    def send_appjson(self, head: bool) -> None:
+        """Unfiltered Application.json of downloaded product by build guid"""
+        guid = self.headers.get("x-adobe-build-guid")
+        if guid not in self.index["guids"]:
+            # products downloaded after mirror started
+            with self.lock:
+                type(self).index = mirror_index(self.prodDir)
+
+        # json in products folder is filtered for languages of mirror host,
+        # clients filter the one from Application.json cache themselves
+        cacheFile = None
+        if guid in self.index["guids"]:
+            cacheFile = appjson_cache_file(guid)
+        if cacheFile is None or not os.path.isfile(cacheFile):
+            self.send_error(404, f"Build {guid} is not in mirror")
+            return
+
+        with open(cacheFile, "r") as f:
+            pkgJson = json.load(f)
+        pkgJson["Cdn"]["Secure"] = self.base_url()
+
+        self.send_data(json.dumps(pkgJson).encode("utf-8"), "application/json", head)
+
+    def send_package(self, path: str, head: bool) -> None:
+        """Package file, with byte range support for resume"""
+        pkgFile = self.index["packages"].get(path)
+        if pkgFile is None:
+            # products downloaded after mirror started
+            with self.lock:
+                type(self).index = mirror_index(self.prodDir)
+            pkgFile = self.index["packages"].get(path)
+
+        if pkgFile is None or not os.path.isfile(pkgFile):
+            self.send_error(404)
+            return
+
+        length = os.path.getsize(pkgFile)
+        start, end = 0, length - 1
+        status = 200
+        reqRange = self.headers.get("Range", "")
+        if reqRange.startswith("bytes="):
+            first, _, last = reqRange[6:].split(",")[0].partition("-")
+            try:
+                if first:
+                    start = int(first)
+                    end = min(int(last), end) if last else end
+                else:
+                    start = max(0, length - int(last))
+            except ValueError:
+                start = length
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{length}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{length}")
+        self.end_headers()
+        if head:
+            return
+
+        remain = end - start + 1
+        with open(pkgFile, "rb") as f:
+            f.seek(start)
+            while remain > 0:
+                data = f.read(min(1024 * 1024, remain))
+                if not data:
+                    break
+                self.wfile.write(data)
+                remain -= len(data)
+
+
+def serve_mirror(args: argparse.Namespace) -> None:
+    """Run mirror server for downloaded products"""
+    global cfg
+    prodDir = os.path.join(base_dir(args), "products")
+    if not os.path.isdir(prodDir):
+        sys.exit(f"\nProducts directory not found: {prodDir}")
+
+    # catalog and Application.json files are read from cache
+    cfg = {
+        "cacheDir": cache_dir(args),
+        "catalogTtl": args.catalogTtl,
+        "chunkSize": max(1, args.chunkSize) * 1024,
+        "limit": 0,
+        "hostLimit": 0,
+        "limitHours": None,
+        "progress": "none",
+        "appJsonCache": max(0, args.appJsonCache) * 1024 * 1024,
+    }
+    os.makedirs(cfg["cacheDir"], exist_ok=True)
+    print(f"\nCatalog is cached in {cfg['cacheDir']} and checked for changes every {args.catalogTtl} seconds")
+
+    MirrorHandler.prodDir = prodDir
+    MirrorHandler.index = mirror_index(prodDir)
+    print("\nServing {} products and {} packages from {}".format(
+        len(MirrorHandler.index["guids"]), len(MirrorHandler.index["packages"]), prodDir))
+
+    server = ThreadingHTTPServer((args.bind, args.serve), MirrorHandler)
+    print(f"\nMirror is running on http://{args.bind}:{args.serve}, press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nMirror stopped")
+    finally:
+        server.server_close()
+
+
+def acrobat_assets(manifest: ET.Element) -> tuple[dict, str | None]:
+    """Get numbered acrobat downloads of manifest and number of full installer"""
     productList = {}
-    prodNum = 0
-    availNums = []
     full = None
-    for asset in assetList:
-        prodNum += 1
-        availNums.append(str(prodNum))
+    for prodNum, asset in enumerate(manifest.findall("./asset_list/asset"), 1):
         assetPath = asset.find("./asset_path").text
         baseVersion = asset.find(".//baseVersion")
         if baseVersion is not None:
@@ -1157,10 +3804,42 @@ def download_acrobat(prodInfo, toDown):
             "assetPath": assetPath,
             "baseVersion": baseVersion,
         }
+    return productList, full
+
+
+def acrobat_choice(productList: dict, choice: str) -> str | None:
+    """Find download for full, base version or file name"""
+    choice = choice.lower()
+    selectedCode = None
+    for n, p in productList.items():
+        if choice == "full" and p["baseVersion"] is None:
+            selectedCode = n
+        elif choice in (str(p["baseVersion"]).lower(), p["assetName"].lower()):
+            selectedCode = n
+    return selectedCode
+
+
+def download_acrobat(prodInfo, toDown) -> bool:
+    """Download acrobat installer or updates, return False if it failed"""
+    url = cfg['cdn'] + prodInfo["manifestURL"]
+
+    print("\nDownloading manifest.xml ...")
+    manifest = download_xml(url, ADOBE_REQ_HEADERS)
+
+    # check available products
+    productList, full = acrobat_assets(manifest)
+    availNums = list(productList)
 
     # select product to download
     selectedCode = None
-    if len(toDown) > 1:
+    if cfg["acrobat"]:
+        selectedCode = acrobat_choice(productList, cfg["acrobat"])
+        if selectedCode is None:
+            print(f"\nAcrobat download {cfg['acrobat']} not found!")
+            if cfg["headless"]:
+                return False
+
+    elif len(toDown) > 1 or cfg["headless"]:
         selectedCode = full
 
     while selectedCode is None:
@@ -1202,12 +3881,232 @@ def download_acrobat(prodInfo, toDown):
     print("\nDownloading Adobe Acrobat v. {} for {}...".format(
         prodInfo["productVersion"], prodInfo["appPlatform"]))
 
-    download_file(assetPath, aproDir)
+    assetSize = productList[selectedCode]["assetSize"]
+    return download_file(assetPath, aproDir, size=int(
+        assetSize) if assetSize and assetSize.isdigit() else 0)
+
+
+def load_jobs(jobFile: str) -> dict:
+    """Read json or toml job file"""
+    try:
+        if jobFile.lower().endswith(".toml"):
+            if tomllib is None:
+                sys.exit("\nYou need Python 3.11 or newer for toml job files!")
+            with open(jobFile, "rb") as f:
+                data = tomllib.load(f)
+        else:
+            with open(jobFile, "r") as f:
+                data = json.load(f)
+    except (OSError, ValueError) as e:
+        sys.exit(f"\nCannot read job file {jobFile}: {e}")
+
+    if not isinstance(data.get("jobs"), list) or not data["jobs"]:
+        sys.exit(f"\nJob file {jobFile} has no jobs list!")
+
+    return data
+
+
+def job_arguments(args: argparse.Namespace, data: dict, index: int) -> argparse.Namespace:
+    """Get arguments of job, job values replace defaults and command line values"""
+    values = dict(vars(args))
+    job = dict(data.get("defaults", {}), **data["jobs"][index])
+    for key, val in job.items():
+        if key == "name":
+            continue
+        dest = JOB_KEYS.get(key, key)
+        if dest not in values or dest in ("job", "jobIndex", "serve", "query"):
+            raise ValueError(f"unknown key {key}")
+        if isinstance(val, list) and dest != "target":
+            val = ",".join(str(v) for v in val)
+        values[dest] = val
+
+    # same defaults as prompts
+    values["urlVersion"] = values["urlVersion"] or "v6"
+    values["appPlatform"] = values["appPlatform"] or "win64"
+    values["noRepeatPrompt"] = True
+    return argparse.Namespace(**values)
+
+
+def job_name(data: dict, index: int) -> str:
+    """Name of job for messages and log file"""
+    return str(data["jobs"][index].get("name") or f"job{index + 1}")
+
+
+@contextmanager
+def restored_globals():
+    """Undo server urls, request headers, session adapters and config set by set_config"""
+    global ADOBE_PRODUCTS_XML_URL, ADOBE_APPLICATION_JSON_URL, cfg
+    urls = (ADOBE_PRODUCTS_XML_URL, ADOBE_APPLICATION_JSON_URL)
+    headers = dict(ADOBE_REQ_HEADERS)
+    adapters = OrderedDict(session.adapters)
+    oldCfg = globals().get("cfg")
+    oldAioSession = aioSession
+    try:
+        yield
+    finally:
+        if aioSession is not oldAioSession:
+            # session of asyncio engine was opened with job config
+            run_async(close_aio_session())
+        ADOBE_PRODUCTS_XML_URL, ADOBE_APPLICATION_JSON_URL = urls
+        ADOBE_REQ_HEADERS.clear()
+        ADOBE_REQ_HEADERS.update(headers)
+        for prefix, adapter in session.adapters.items():
+            if adapters.get(prefix) is not adapter:
+                adapter.close()
+        session.adapters = adapters
+        if oldCfg is None:
+            globals().pop("cfg", None)
+        else:
+            cfg = oldCfg
+
+
+def validate_job(jobArgs: argparse.Namespace) -> list[str]:
+    """Check job values against products list, return errors"""
+    errors = []
+    if not jobArgs.sapCode:
+        return ["no products"]
+    if not split_list(str(jobArgs.urlVersion).lower(), ["v4", "v5", "v6", "4", "5", "6"]):
+        errors.append(f"invalid url version {jobArgs.urlVersion}")
+    if not split_list(jobArgs.appPlatform, ["win32", "win64", "winarm64"]):
+        errors.append(f"invalid platform {jobArgs.appPlatform}")
+    if errors:
+        return errors
+
+    with restored_globals():
+        return validate_products(jobArgs)
+
+
+def validate_products(jobArgs: argparse.Namespace) -> list[str]:
+    """Check products, versions, languages and acrobat download of job"""
+    global cfg
+    errors = []
+    cfg = set_config(jobArgs)
+    for origin, (originCfg, allProducts) in get_catalogs(cfg).items():
+        for sapCode in jobArgs.sapCode.upper().split(","):
+            product = allProducts.get(sapCode)
+            if product is None:
+                errors.append(f"{sapCode} is not available for {origin}")
+                continue
+
+            version = jobArgs.version or get_last_version(product["versions"])
+            prodInfo = product["versions"].get(version)
+            if prodInfo is None:
+                errors.append(f"{sapCode} version {version} is not available for {origin}")
+                continue
+
+            appLangs = prodInfo["supportedLanguages"]
+            if jobArgs.installLanguage and not jobArgs.target and "all" not in jobArgs.installLanguage:
+                if not any(l in appLangs for l in jobArgs.installLanguage.split(",")) and len(appLangs) > 1:
+                    errors.append("{} {} has no language of {}".format(
+                        sapCode, version, jobArgs.installLanguage))
+
+            if sapCode == "APRO" and jobArgs.acrobat:
+                print("\nDownloading manifest.xml ...")
+                manifest = download_xml(originCfg["cdn"] + prodInfo["manifestURL"], ADOBE_REQ_HEADERS)
+                if acrobat_choice(acrobat_assets(manifest)[0], jobArgs.acrobat) is None:
+                    errors.append(f"Acrobat download {jobArgs.acrobat} is not available for {origin}")
+
+    return errors
+
+
+def run_job_file(args: argparse.Namespace) -> int:
+    """Check all jobs of job file, then run them, return number of failed jobs"""
+    data = load_jobs(args.job)
+    jobs = []
+    errors = []
+    for index in range(len(data["jobs"])):
+        name = job_name(data, index)
+        jobArgs = None
+        try:
+            jobArgs = job_arguments(args, data, index)
+            jobErrors = validate_job(jobArgs)
+        except ValueError as e:
+            jobErrors = [str(e)]
+        errors += [f"[{name}] {e}" for e in jobErrors]
+        jobs.append((index, name, jobArgs))
+
+    if errors:
+        print("\nJob file is not valid:")
+        for e in errors:
+            print(f"  {e}")
+        return len(data["jobs"])
+
+    # jobs with same destination, cache or store write same files, run them in order
+    groups = []
+    for index, name, jobArgs in jobs:
+        paths = {os.path.realpath(base_dir(jobArgs)), os.path.realpath(cache_dir(jobArgs))}
+        if jobArgs.store:
+            paths.add(os.path.realpath(jobArgs.store))
+        group = [(index, name)]
+        for other in [g for g in groups if g[0] & paths]:
+            groups.remove(other)
+            paths |= other[0]
+            group += other[1]
+        groups.append((paths, sorted(group)))
+
+    logDir = os.path.join(cache_dir(args), "jobs")
+    os.makedirs(logDir, exist_ok=True)
+    command = [sys.executable, os.path.realpath(sys.argv[0])] + sys.argv[1:]
+
+    def run_group(group: list[tuple[int, str]]) -> list[str]:
+        failed = []
+        for index, name in group:
+            logFile = os.path.join(logDir, re.sub(r"[^\w.-]", "_", name) + ".log")
+            print(f"\n[{name}] started, log: {logFile}")
+            with open(logFile, "w") as log:
+                result = subprocess.run(
+                    command + ["--jobIndex", str(index)],
+                    stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+            status = "finished" if result.returncode == 0 else "failed"
+            print(f"\n[{name}] {status}")
+            if result.returncode != 0:
+                failed.append(name)
+        return failed
+
+    print(f"\nRunning {len(jobs)} jobs in {len(groups)} groups")
+    failed = []
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        for groupFailed in executor.map(run_group, [g for _, g in groups]):
+            failed += groupFailed
+
+    if failed:
+        print("\nFailed jobs: {}".format(", ".join(failed)))
+    else:
+        print("\nAll jobs finished")
+    return len(failed)
+
+
+def run_origins(catalogs: OrderedDict) -> list[str]:
+    """Run download for every url version and platform, return failed products"""
+    global cfg
+    if len(catalogs) == 1:
+        cfg, allProducts = next(iter(catalogs.values()))
+        return run_ccdl(allProducts)
+
+    # select products once from all products lists
+    cfg = next(iter(catalogs.values()))[0]
+    toDown = download_list(merge_products(catalogs))
+
+    failed = []
+    for origin, (originCfg, allProducts) in catalogs.items():
+        cfg = originCfg
+        codes = [c for c in toDown if c in allProducts]
+        if not codes:
+            print("\nNo selected products available for {}".format(origin))
+            continue
+
+        print("\n{}\nDownloading products for {}".format("-" * 40, origin))
+        cfg["toDown"] = ",".join(codes)
+        failed += [f"{sapCode} ({origin})" for sapCode in run_ccdl(allProducts)]
+
+    return failed
 
 
-def run_ccdl(allProducts: dict) -> None:
-    """Run Main execution."""
+def run_ccdl(allProducts: dict) -> list[str]:
+    """Run Main execution, return failed products"""
     toDown = download_list(allProducts)
+    failed = []
+    roots = []
 
     for sapCode in toDown:
         product = allProducts.get(sapCode)
@@ -1219,37 +4118,78 @@ def run_ccdl(allProducts: dict) -> None:
 
         prodInfo = select_app_version(product, batch)
 
-        # language select
+        # language select, targets have their own languages
         appLangs = prodInfo["supportedLanguages"]
-        installLanguage = install_language(appLangs)
+        if cfg["targets"]:
+            installLanguage = list(dict.fromkeys(
+                l for t in cfg["targets"] for l in t["langs"]))
+        else:
+            installLanguage = install_language(appLangs)
 
-        if "productIcons" in prodInfo:
+        if "productIcons" in prodInfo and not cfg["plan"]:
             download_icons(prodInfo)
 
         # download by manifest url
         if sapCode == "APRO":
-            download_acrobat(prodInfo, toDown)
+            if cfg["plan"]:
+                print("\nAcrobat is not included in download plan")
+            elif not download_acrobat(prodInfo, toDown):
+                failed.append(sapCode)
             continue
 
-        product_download(prodInfo, allProducts, installLanguage)
+        roots.append((prodInfo, installLanguage))
+
+    if roots:
+        failed += product_download(roots, allProducts)
+
+    return failed
 
 
 if __name__ == "__main__":
+    args = get_arguments()
+    if args.planJson == "-":
+        # console gets only the plan json, messages go to stderr
+        sys.stdout = sys.stderr
+
     show_info(SCRIPT_NAME, VERSION_STR, 6, "=")
+    start_tracing(args)
+    if args.job:
+        if args.jobIndex is None:
+            sys.exit(1 if run_job_file(args) else 0)
+
+        data = load_jobs(args.job)
+        print(f"\nRunning job {job_name(data, args.jobIndex)} from {args.job}")
+        args = job_arguments(args, data, args.jobIndex)
+
+    if args.query:
+        run_query(args)
+        sys.exit()
+
+    if args.serve:
+        serve_mirror(args)
+        sys.exit()
 
     # get and set configuration
-    cfg = set_config()
+    cfg = set_config(args)
 
     # get available products
-    allProducts = get_products(cfg)
+    catalogs = get_catalogs(cfg)
 
     while True:
         try:
             # run main program
-            run_ccdl(allProducts)
+            failed = run_origins(catalogs)
+            if failed:
+                print("\nSome packages failed to download for: {}".format(
+                    ", ".join(failed)))
+
+            if cfg["plan"]:
+                write_plan(planReports, args.planJson)
+                break
 
             # reset download list
-            cfg["toDown"] = None
+            for originCfg, _ in catalogs.values():
+                originCfg["toDown"] = None
 
             if cfg["noRepeat"] or not questiony(
                 "\nDo you want to download another package"
@@ -1260,3 +4200,10 @@ if __name__ == "__main__":
         except KeyboardInterrupt:
             print("\nTerminated by user")
             sys.exit()
+
+    if aioSession is not None:
+        run_async(close_aio_session())
+
+    # failed job for job runner
+    if cfg["headless"] and failed:
+        sys.exit(1)
@@ -0,0 +1,15 @@
+import os
+import importlib.util
+
+import pytest
+
+CCDL_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "ccdl-win.py")
+
+
+@pytest.fixture(scope="session")
+def ccdl():
+    """ccdl-win.py imported as module"""
+    spec = importlib.util.spec_from_file_location("ccdl", CCDL_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,91 @@
+import pytest
+
+
+def env(ccdl, langs=("en_US",), osProc="64-bit", osVersion="10.0.19045"):
+    return {
+        "OSProcessorFamily": osProc,
+        "OSVersion": ccdl.version_tuple(osVersion),
+        "installLanguage": list(langs),
+    }
+
+
+@pytest.mark.parametrize("cond, tree", [
+    ("[OSVersion]>=10.0", ("cmp", "OSVersion", ">=", "10.0")),
+    ("[installLanguage]==\"de_DE\"", ("cmp", "installLanguage", "==", "de_DE")),
+    ("!([a]==1)", ("not", ("cmp", "a", "==", "1"))),
+    ("[a]==1 || [b]==2 && [c]==3", ("||", [
+        ("cmp", "a", "==", "1"),
+        ("&&", [("cmp", "b", "==", "2"), ("cmp", "c", "==", "3")]),
+    ])),
+    ("([a]==1 || [b]==2) && [c]==3", ("&&", [
+        ("||", [("cmp", "a", "==", "1"), ("cmp", "b", "==", "2")]),
+        ("cmp", "c", "==", "3"),
+    ])),
+])
+def test_parse_condition(ccdl, cond, tree):
+    assert ccdl.parse_condition(cond) == tree
+
+
+@pytest.mark.parametrize("cond", ["[a]==", "([a]==1", "[a]==1 &&", "[a]==1 [b]==2", "[a]=~1"])
+def test_parse_condition_errors(ccdl, cond):
+    with pytest.raises(ValueError):
+        ccdl.parse_condition(cond)
+
+
+def test_unreadable_condition_keeps_package(ccdl):
+    assert ccdl.compile_condition("[a]==1 &&") is None
+    assert ccdl.test_condition("[a]==1 &&", env(ccdl)) is True
+
+
+@pytest.mark.parametrize("cond, osVersion, keep", [
+    ("[OSVersion]>=10.0.17763", "10.0.19045", True),
+    ("[OSVersion]>=10.0.17763", "10.0.9200", False),
+    ("[OSVersion]<10.0.22000", "10.0.19045", True),
+    ("[OSVersion]==10.0", "10.0.0", True),
+    ("[OSVersion]>10.0", "10.0.0", False),
+    ("[OSVersion]<=6.3", "6.3.9600", False),
+])
+def test_os_version_compares_parts(ccdl, cond, osVersion, keep):
+    assert ccdl.test_condition(cond, env(ccdl, osVersion=osVersion)) is keep
+
+
+@pytest.mark.parametrize("cond, langs, keep", [
+    ("[installLanguage]==de_DE", ["de_DE"], True),
+    ("[installLanguage]==de_DE", ["en_US"], False),
+    ("[installLanguage]!=de_DE", ["en_US"], True),
+    ("[installLanguage]==fr_FR || [installLanguage]==de_DE", ["de_DE", "ja_JP"], True),
+    ("!([installLanguage]==en_US)", ["en_US"], False),
+])
+def test_install_language(ccdl, cond, langs, keep):
+    assert ccdl.test_condition(cond, env(ccdl, langs=langs)) is keep
+
+
+@pytest.mark.parametrize("cond", [
+    "[installLanguage]==de_DE",
+    "[installLanguage]!=de_DE",
+    "!([installLanguage]==de_DE)",
+    "[installLanguage]==de_DE || [OSVersion]<6.0",
+    "[installLanguage]==de_DE && [OSProcessorFamily]==64-bit",
+])
+def test_all_languages_keep_language_packages(ccdl, cond):
+    assert ccdl.test_condition(cond, env(ccdl, langs=["all"])) is True
+
+
+def test_known_values_decide_over_all_languages(ccdl):
+    cond = "[installLanguage]==de_DE && [OSProcessorFamily]==32-bit"
+    assert ccdl.test_condition(cond, env(ccdl, langs=["all"])) is False
+
+
+@pytest.mark.parametrize("cond, keep", [
+    ("[OSArchitecture]==arm64", True),
+    ("[OSArchitecture]==arm64 || [OSProcessorFamily]==32-bit", True),
+    ("[OSArchitecture]==arm64 && [OSProcessorFamily]==32-bit", False),
+    ("!([OSArchitecture]==arm64)", True),
+])
+def test_unknown_values_keep_package(ccdl, cond, keep):
+    assert ccdl.test_condition(cond, env(ccdl)) is keep
+
+
+def test_compiled_once(ccdl):
+    cond = "[OSProcessorFamily]==64-bit && [OSVersion]>=10.0.19041"
+    assert ccdl.compile_condition(cond) is ccdl.compile_condition(cond)
@@ -0,0 +1,243 @@
+"""
+Benchmark of products list parsing: parse time and tracemalloc peak.
+
+A large products xml is generated, then parsed by the old way (whole
+data in memory, ET.fromstring and findall over the full tree) and by
+parse_products of ccdl-win.py fed with file chunks like a download,
+which drops each product after it is read.
+
+run: python tools/bench_catalog.py --products 3000 --rounds 3
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+import importlib.util
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+CCDL_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "ccdl-win.py")
+
+PLATFORMS = ["win64", "win32", "winarm64", "macuniversal", "macarm64"]
+LOCALES = [
+    "en_US", "en_GB", "fr_FR", "de_DE", "ja_JP", "ko_KR", "zh_CN", "zh_TW",
+    "es_ES", "it_IT", "pt_BR", "ru_RU", "nl_NL", "sv_SE", "pl_PL", "cs_CZ",
+    "tr_TR", "uk_UA", "hu_HU", "da_DK", "fi_FI", "nb_NO",
+]
+
+
+def load_ccdl(chunkSize: int):
+    """Import ccdl-win.py with config needed by products parser"""
+    spec = importlib.util.spec_from_file_location("ccdl", CCDL_PATH)
+    ccdl = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ccdl)
+    ccdl.cfg = {"chunkSize": chunkSize}
+    return ccdl
+
+
+def parse_config() -> dict:
+    return {
+        "allowedPlatforms": ["win64", "win32"],
+        "reqAppPlatform": "win64",
+        "reqUrlVer": "6",
+        "origin": "v6/win64",
+        "downIcons": True,
+    }
+
+
+def product_xml(rnd: random.Random, i: int) -> str:
+    """One product element with platforms, versions, locales and icons"""
+    sapCode = f"P{i:04d}"
+    parts = [f'<product id="{sapCode}"><displayName>Product {i}</displayName><productIcons>']
+    for size in ("48x48", "96x96", "192x192"):
+        parts.append(f'<icon size="{size}">https://cdn.example.com/icons/{sapCode}/{size}.png</icon>')
+    parts.append("</productIcons><platforms>")
+    for plat in PLATFORMS:
+        parts.append(f'<platform id="{plat}">')
+        for v in range(rnd.randint(2, 6)):
+            version = f"{20 + v}.{rnd.randint(0, 9)}"
+            parts.append(
+                f'<languageSet packageType="hdPackage" productVersion="{version}" '
+                f'buildGuid="{rnd.getrandbits(128):032x}"><locales>')
+            if i % 7 == 0:
+                parts.append('<locale name="mul"/>')
+            else:
+                for lc in rnd.sample(LOCALES, rnd.randint(5, len(LOCALES))):
+                    parts.append(f'<locale name="{lc}"/>')
+            parts.append(
+                f"</locales><urls><manifestURL>/{sapCode}/{version}/{plat}/{rnd.getrandbits(64):016x}"
+                "/application.json</manifestURL></urls></languageSet>")
+        parts.append("</platform>")
+    parts.append("</platforms><custom-data>")
+    for lc in LOCALES:
+        parts.append(f'<custom-entry key="tutorialsPage_{lc}">https://helpx.example.com/{lc}/{sapCode}</custom-entry>')
+    parts.append("</custom-data></product>")
+    return "".join(parts)
+
+
+def make_catalog(path: str, products: int, seed: int) -> None:
+    """Write products xml with ccm and sti channels"""
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0"?><response><channels><channel name="ccm">'
+                "<cdn><secure>https://ccmdl.example.com</secure></cdn><products>")
+        for i in range(products):
+            if i == products * 4 // 5:
+                f.write('</products></channel><channel name="sti"><products>')
+            f.write(product_xml(rnd, i))
+        f.write("</products></channel></channels></response>")
+
+
+# products parser of ccdl-win.py before streaming parser
+
+
+def old_parse(ccdl, data: bytes, cfg: dict) -> dict:
+    productXml = ET.fromstring(data)
+
+    # add cdn address to config
+    cfg['cdn'] = productXml.find(".//*/cdn/secure").text
+
+    # parse xml data
+    allProducts = {}
+    for channel in productXml.findall(".//channel"):
+        appType = "dep"
+        if channel.attrib["name"] == "ccm":
+            appType = "app"
+
+        for product in channel.findall("./products/product"):
+            sapCode = product.get("id")
+            displayName = product.find("displayName").text
+            for plat in [
+                item
+                for item in product.findall("./platforms/platform")
+                if item.attrib["id"] in cfg["allowedPlatforms"]
+            ]:
+                appPlatform = plat.attrib["id"]
+                # platform filter for main app
+                if appType == "app" and appPlatform != cfg["reqAppPlatform"]:
+                    continue
+
+                if plat.findall(
+                    "./languageSet[@packageType='hdPackage']"
+                ) or plat.findall("./languageSet[@packageType='application']"):
+                    if not allProducts.get(sapCode):
+                        allProducts[sapCode] = {
+                            "appType": appType,
+                            "displayName": displayName,
+                            "sapCode": sapCode,
+                            "versions": OrderedDict(),
+                        }
+
+                    for ls in plat.findall("languageSet"):
+                        languageSet = ls.attrib
+                        productVersion = languageSet.get("productVersion")
+
+                        manifestURL = ls.find(".//manifestURL")
+                        if manifestURL is not None:
+                            manifestURL = manifestURL.text
+
+                        if (
+                            productVersion is None
+                            and ls.find(".//appVersion") is not None
+                        ):
+                            productVersion = ls.find(".//appVersion").text
+
+                        # check available languages using tutorial pages
+                        langList = ccdl.product_languages(ls)
+                        if len(langList) == 1 and langList[0] == "mul":
+                            tutLangs = []
+                            for cEntries in product.findall("./custom-data/custom-entry"):
+                                eKey = cEntries.get("key")
+                                if "tutorialsPage_" in eKey:
+                                    tutLocale = eKey.split("_", 1)[1]
+                                    if tutLocale != "mul":
+                                        tutLangs.append(tutLocale)
+
+                            if tutLangs:
+                                langList = tutLangs
+
+                        # get product with version
+                        if productVersion is not None:
+                            allProducts[sapCode]["versions"][productVersion] = {
+                                "sapCode": sapCode,
+                                "displayName": displayName,
+                                "appPlatform": appPlatform,
+                                "productVersion": productVersion,
+                                "supportedLanguages": langList,
+                                "buildGuid": languageSet.get("buildGuid"),
+                                "manifestURL": manifestURL,
+                            }
+                            if cfg["downIcons"]:
+                                allProducts[sapCode]["versions"][productVersion]['productIcons'] = ccdl.product_icons(
+                                    product)
+                        else:
+                            if int(cfg["reqUrlVer"]) >= 5:
+                                allProducts.pop(sapCode, None)
+
+    return allProducts
+
+
+def run_old(ccdl, path: str) -> dict:
+    # old download kept whole response in memory
+    with open(path, "rb") as f:
+        data = f.read()
+    return old_parse(ccdl, data, parse_config())
+
+
+def run_new(ccdl, path: str) -> dict:
+    return ccdl.parse_products(ccdl.file_chunks(path), parse_config())
+
+
+def measure(name: str, func, ccdl, path: str, rounds: int) -> dict:
+    """Print best parse time of rounds and tracemalloc peak of one run"""
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func(ccdl, path)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+        result = None
+
+    tracemalloc.start()
+    result = func(ccdl, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"{name:<24}{best * 1000:>10.1f} ms{peak / 1024 ** 2:>10.1f} MB peak")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--products", help="Products in generated list", type=int, default=3000
+    )
+    parser.add_argument(
+        "--chunkSize", help="Read size in KB for streaming parser", type=int, default=1024
+    )
+    parser.add_argument(
+        "--rounds", help="Runs of each variant, best time is shown", type=int, default=3
+    )
+    parser.add_argument(
+        "--seed", help="Seed of generated products list", type=int, default=1
+    )
+    args = parser.parse_args()
+
+    ccdl = load_ccdl(args.chunkSize * 1024)
+    with tempfile.TemporaryDirectory() as tmpDir:
+        path = os.path.join(tmpDir, "products.xml")
+        make_catalog(path, args.products, args.seed)
+        print(f"{args.products} products, {os.path.getsize(path) / 1024 ** 2:.1f} MB xml, best of {args.rounds}\n")
+
+        old = measure("old ET.fromstring", run_old, ccdl, path, args.rounds)
+        new = measure("parse_products", run_new, ccdl, path, args.rounds)
+
+    # new parser also records origin of products
+    for product in new.values():
+        product.pop("origin")
+    if old != new:
+        sys.exit("Parsers read different products")
@@ -0,0 +1,235 @@
+"""
+Benchmark of package condition checks: old string tests and compiled conditions.
+
+Every condition of corpus (one per line, default tools/conditions.txt) is
+checked for a few install targets, like package filter does for every
+package of Application.json. Old test_and/test_or split the string on every
+check, compile_condition of ccdl-win.py parses it once.
+
+run: python tools/bench_conditions.py --rounds 2000 --diff
+"""
+
+import os
+import sys
+import time
+import operator
+import argparse
+import importlib.util
+
+TOOLS_PATH = os.path.dirname(os.path.realpath(__file__))
+CCDL_PATH = os.path.join(TOOLS_PATH, "..", "ccdl-win.py")
+
+# language, processor family and windows version of install targets
+TARGETS = [
+    (["en_US"], "64-bit", "10.0.19045"),
+    (["de_DE", "fr_FR"], "64-bit", "10.0.17763"),
+    (["ja_JP"], "32-bit", "6.3.9600"),
+    (["all"], "64-bit", "10.0.22631"),
+]
+
+
+def load_ccdl():
+    """Import ccdl-win.py"""
+    spec = importlib.util.spec_from_file_location("ccdl", CCDL_PATH)
+    ccdl = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ccdl)
+    return ccdl
+
+
+# condition tests of ccdl-win.py before compiled conditions
+
+
+def do_test(cond: str, key: str | list[str]) -> bool:
+    """Test condition based on condition strings"""
+    if "==" in cond:
+        val = cond.split("==")
+        opt = operator.eq
+    elif "!=" in cond:
+        val = cond.split("!=")
+        opt = operator.ne
+    elif "<=" in cond:
+        val = cond.split("<=")
+        opt = operator.le
+    elif ">=" in cond:
+        val = cond.split(">=")
+        opt = operator.ge
+    elif ">" in cond:
+        val = cond.split(">")
+        opt = operator.gt
+    elif "<" in cond:
+        val = cond.split("<")
+        opt = operator.lt
+    else:
+        return True
+
+    # stripped string
+    cmp = val[1].strip()
+
+    if "OSVersion" in val[0]:
+        keys = key.split(".")
+        cmps = cmp.split(".")
+        idx = -1
+        for c in cmps:
+            idx = idx + 1
+            if (idx > 0):
+                c = float(f"0.{c}")
+                k = float(f"0.{keys[idx]}")
+            else:
+                c = int(c)
+                k = int(keys[idx])
+
+            if opt(k, c) is not True:
+                return False
+
+    if isinstance(key, list):
+        return cmp in key
+
+    return opt(key, cmp)
+
+
+def test_and(str: str, osProc: str, osver: str, langs: list[str]) -> bool:
+    """Check AND (&&) test result"""
+    conds = str.split("&&")
+    for c in conds:
+        if "OSProcessorFamily" in c:
+            if do_test(c, osProc) is not True:
+                return False
+
+        if "OSVersion" in c:
+            if do_test(c, osver) is not True:
+                return False
+
+        if "installLanguage" in c:
+            if "all" in langs:
+                return True
+
+            if do_test(c, langs) is not True:
+                return False
+
+    return True
+
+
+def test_or(str: str, osProc: str, osver: str, langs: list[str]) -> bool:
+    """Check OR (||) test result"""
+    conds = str.split("||")
+    for c in conds:
+        if "OSProcessorFamily" in c:
+            if do_test(c, osProc) is True:
+                return True
+
+        if "OSVersion" in c:
+            if do_test(c, osver) is True:
+                return True
+
+        if "installLanguage" in c:
+            if "all" in langs:
+                return True
+
+            if do_test(c, langs) is True:
+                return True
+
+    return False
+
+
+def old_keep(cond: str, osProc: str, osver: str, langs: list[str]) -> bool:
+    """Package decision of old condition filter"""
+    if "||" in cond:
+        return test_or(cond, osProc, osver, langs) == True
+    return test_and(cond, osProc, osver, langs) == True
+
+
+def load_corpus(path: str) -> list[str]:
+    """Condition strings of corpus file"""
+    with open(path, "r") as f:
+        return [l.strip() for l in f if l.strip()]
+
+
+def run_old(corpus: list[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for langs, osProc, osver in TARGETS:
+            for cond in corpus:
+                old_keep(cond, osProc, osver, langs)
+    return time.perf_counter() - start
+
+
+def run_new(ccdl, corpus: list[str], rounds: int, cold: bool) -> float:
+    envs = [{
+        "OSProcessorFamily": osProc,
+        "OSVersion": ccdl.version_tuple(osver),
+        "installLanguage": langs,
+    } for langs, osProc, osver in TARGETS]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if cold:
+            # every round reads new Application.json
+            ccdl.compile_condition.cache_clear()
+        for env in envs:
+            for cond in corpus:
+                ccdl.test_condition(cond, env)
+    return time.perf_counter() - start
+
+
+def show_diff(ccdl, corpus: list[str]) -> None:
+    """Print conditions where old and new tests keep different packages"""
+    print("\nDifferent decisions (old -> new):")
+    found = False
+    for langs, osProc, osver in TARGETS:
+        env = {
+            "OSProcessorFamily": osProc,
+            "OSVersion": ccdl.version_tuple(osver),
+            "installLanguage": langs,
+        }
+        for cond in corpus:
+            try:
+                old = old_keep(cond, osProc, osver, langs)
+            except (ValueError, IndexError) as e:
+                old = f"error ({e.__class__.__name__})"
+            new = ccdl.test_condition(cond, env)
+            if old != new:
+                found = True
+                print(f"  {','.join(langs)} {osProc} {osver}: {cond}\n    {old} -> {new}")
+    if not found:
+        print("  none")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--corpus", help="File with one condition per line", default=os.path.join(TOOLS_PATH, "conditions.txt")
+    )
+    parser.add_argument(
+        "--rounds", help="Checks of whole corpus for every target", type=int, default=2000
+    )
+    parser.add_argument(
+        "--diff", help="Show conditions with different results", action="store_true"
+    )
+    args = parser.parse_args()
+
+    ccdl = load_ccdl()
+    corpus = load_corpus(args.corpus)
+    # old tests fail on some conditions, they are not timed
+    timed = []
+    for cond in corpus:
+        try:
+            for langs, osProc, osver in TARGETS:
+                old_keep(cond, osProc, osver, langs)
+        except (ValueError, IndexError):
+            continue
+        timed.append(cond)
+
+    checks = args.rounds * len(TARGETS) * len(timed)
+    print(f"{len(timed)} of {len(corpus)} conditions, {len(TARGETS)} targets, {checks} checks\n")
+
+    results = [
+        ("old test_and/test_or", run_old(timed, args.rounds)),
+        ("compiled, new json", run_new(ccdl, timed, args.rounds, cold=True)),
+        ("compiled, cached", run_new(ccdl, timed, args.rounds, cold=False)),
+    ]
+    base = results[0][1]
+    for name, seconds in results:
+        print(f"{name:<24}{seconds * 1e6 / checks:>8.2f} us/check{base / seconds:>8.1f}x")
+
+    if args.diff:
+        show_diff(ccdl, corpus)
@@ -0,0 +1,266 @@
+"""
+Benchmark of Application.json filters: time and tracemalloc peak.
+
+A Premiere sized manifest (packages with conditions, esl language packs,
+modules and Language lists) is generated, then filtered by the old
+language_filter/condition_filter/module_filter chain, which rebuilds the
+whole json for every target, and by package_filter/matrix_filter of
+ccdl-win.py, which share unchanged parts with the source json.
+
+run: python tools/bench_filter.py --packages 600 --rounds 20
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+import contextlib
+import importlib.util
+
+TOOLS_PATH = os.path.dirname(os.path.realpath(__file__))
+CCDL_PATH = os.path.join(TOOLS_PATH, "..", "ccdl-win.py")
+
+LOCALES = [
+    "en_US", "en_GB", "en_AE", "en_IL", "fr_FR", "fr_CA", "fr_MA", "de_DE",
+    "ja_JP", "ko_KR", "zh_CN", "zh_TW", "es_ES", "es_MX", "it_IT", "pt_BR",
+    "ru_RU", "nl_NL", "sv_SE", "pl_PL", "cs_CZ", "tr_TR", "uk_UA", "hu_HU",
+    "da_DK", "fi_FI", "nb_NO", "ar_AE", "he_IL", "th_TH",
+]
+ESL_LANGS = ["en", "fr", "de", "ja", "ko", "cmn", "yue", "es", "it", "pt", "ru"]
+
+# languages of targets, first one is used for single target runs
+TARGETS = [["en_US"], ["de_DE", "fr_FR"], ["ja_JP"], ["zh_CN"]]
+
+
+def load_ccdl():
+    """Import ccdl-win.py with config needed by package filter"""
+    spec = importlib.util.spec_from_file_location("ccdl", CCDL_PATH)
+    ccdl = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ccdl)
+    ccdl.cfg = {
+        "reqAppPlatform": "win64",
+        "osVersion": "10.0.19045",
+    }
+    return ccdl
+
+
+def languages(rnd: random.Random, count: int) -> dict:
+    """Language list like in Application.json"""
+    return {"Language": [
+        {"locale": lc, "value": f"Text for {lc} " * 4} for lc in rnd.sample(LOCALES, count)
+    ] + [{"locale": "mul", "value": "Text"}]}
+
+
+def make_manifest(packages: int, conditions: list[str], seed: int) -> str:
+    """Application.json text with packages, modules and Language lists"""
+    rnd = random.Random(seed)
+    pkgs = []
+    for i in range(packages):
+        name = f"Package{i}"
+        pkg = {
+            "PackageName": name,
+            "Path": f"/products/PPRO/25.0/win64/{name}.zip",
+            "DownloadSize": rnd.randint(10 ** 4, 10 ** 8),
+            "ExtractSize": rnd.randint(10 ** 4, 10 ** 9),
+            "Type": "core" if i % 5 == 0 else "non-core",
+            "PackageHash": "%032x" % rnd.getrandbits(128),
+            "ProcessorFamily": "64-bit",
+        }
+        if i % 10 == 9:
+            # premiere pro/media encoder language packs
+            pkg["PackageName"] = "{}-esl_lp_{}".format(name, ESL_LANGS[i % len(ESL_LANGS)])
+        elif i % 3:
+            pkg["Condition"] = rnd.choice(conditions)
+        if i % 4 == 0:
+            pkg["DisplayName"] = languages(rnd, 12)
+        pkgs.append(pkg)
+
+    modules = [{
+        "Id": f"Module{m}",
+        "DisplayName": languages(rnd, len(LOCALES)),
+        "ReferencePackages": {"ReferencePackage": [p["PackageName"] for p in rnd.sample(pkgs, 8)]},
+    } for m in range(packages // 10)]
+
+    return json.dumps({
+        "SAPCode": "PPRO",
+        "ProductVersion": "25.0",
+        "SupportedLanguages": languages(rnd, len(LOCALES)),
+        "Packages": {"Package": pkgs},
+        "Modules": {"Module": modules},
+    })
+
+
+def load_conditions(path: str) -> list[str]:
+    """Condition strings of corpus file"""
+    with open(path, "r") as f:
+        return [l.strip() for l in f if l.strip()]
+
+
+# package filter of ccdl-win.py before matrix filter
+
+
+def language_filter(pkgJson: dict | list, language: list) -> dict:
+    """Stripped out unnecessary data from json file"""
+    if "mul" in language or "all" in language:
+        return pkgJson
+
+    if isinstance(pkgJson, dict):
+        key = "Language"
+        # filter by locale
+        for k, v in pkgJson.items():
+            filtered = None
+            if k == key:
+                filtered = []
+                for lc in v:
+                    if lc["locale"] in language or lc["locale"] == "mul":
+                        filtered.append(lc)
+
+        # replace with filtered result
+        pkgJson = {
+            k: filtered if k == key and v else language_filter(v, language)
+            for k, v in pkgJson.items()
+        }
+
+    if isinstance(pkgJson, list):
+        pkgJson = [language_filter(v, language) for v in pkgJson]
+
+    return pkgJson
+
+
+def condition_filter(ccdl, pkgJson: dict, langs: list[str]) -> dict:
+    """Filter packages by condition statements"""
+    env = ccdl.condition_env(langs)
+
+    newPkgs = []
+    for pkg in pkgJson["Packages"]["Package"]:
+        if "Condition" in pkg:
+            if ccdl.test_condition(pkg["Condition"], env):
+                newPkgs.append(pkg)
+
+        # premiere pro/media encoder
+        elif "-esl_lp_" in pkg["PackageName"]:
+            if "all" in langs or "mul" in langs:
+                newPkgs.append(pkg)
+            else:
+                app, pproLang = pkg["PackageName"].split("-")
+                pproLang = pproLang.replace("esl_lp_", "")
+                for l in langs:
+                    main, locale = l.split("_")
+                    if main == pproLang:
+                        newPkgs.append(pkg)
+                    # for china languages
+                    if main == "zh":
+                        if pproLang == "cmn" or pproLang == "yue":
+                            newPkgs.append(pkg)
+
+        else:
+            newPkgs.append(pkg)
+
+    pkgJson["Packages"]["Package"] = newPkgs
+
+    return pkgJson
+
+
+def module_filter(pkgJson: dict) -> dict:
+    """Rebuild module for selected packages"""
+    if "Modules" in pkgJson:
+        packageNames = []
+        for names in pkgJson["Packages"]["Package"]:
+            packageNames.append(names["PackageName"])
+
+        allModules = pkgJson["Modules"]["Module"]
+        newModules = []
+        for module in allModules:
+            refPackage = module["ReferencePackages"]["ReferencePackage"]
+            for names in refPackage:
+                if names in packageNames:
+                    newModules.append(module)
+
+        pkgJson["Modules"]["Module"] = newModules
+    return pkgJson
+
+
+def old_filter(ccdl, pkgJson: dict, lang: list[str]):
+    pkgJson = language_filter(pkgJson, lang)
+    pkgJson = condition_filter(ccdl, pkgJson, lang)
+    pkgJson = module_filter(pkgJson)
+    return pkgJson, ccdl.get_package_url(pkgJson)
+
+
+def run_old(ccdl, pkgJson: dict, targets: list[list[str]]) -> list:
+    return [old_filter(ccdl, pkgJson, lang) for lang in targets]
+
+
+def run_new(ccdl, pkgJson: dict, targets: list[list[str]]) -> list:
+    if len(targets) == 1:
+        return [ccdl.package_filter(pkgJson, targets[0])]
+    return ccdl.matrix_filter(pkgJson, [(lang, ccdl.condition_env(lang)) for lang in targets])
+
+
+def measure(ccdl, func, text: str, targets: list[list[str]], rounds: int) -> tuple[float, int, list]:
+    """Best filter time of rounds and tracemalloc peak of one filter run"""
+    best = None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(rounds):
+            # every round reads new Application.json, old filter changes it
+            pkgJson = json.loads(text)
+            start = time.perf_counter()
+            result = func(ccdl, pkgJson, targets)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+
+        pkgJson = json.loads(text)
+        tracemalloc.start()
+        func(ccdl, pkgJson, targets)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return best, peak, result
+
+
+def same_result(old: list, new: list) -> bool:
+    """Check both filters keep same packages, modules and urls"""
+    for (oldJson, oldUrl), (newJson, newUrl) in zip(old, new):
+        # old module filter adds a module once for every kept reference
+        modules = []
+        for m in oldJson["Modules"]["Module"]:
+            if m not in modules:
+                modules.append(m)
+        oldJson["Modules"]["Module"] = modules
+        if json.dumps(oldJson, sort_keys=True) != json.dumps(newJson, sort_keys=True) or oldUrl != newUrl:
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--packages", help="Packages in generated Application.json", type=int, default=600
+    )
+    parser.add_argument(
+        "--rounds", help="Runs of each variant, best time is shown", type=int, default=20
+    )
+    parser.add_argument(
+        "--corpus", help="File with one condition per line", default=os.path.join(TOOLS_PATH, "conditions.txt")
+    )
+    parser.add_argument(
+        "--seed", help="Seed of generated Application.json", type=int, default=1
+    )
+    args = parser.parse_args()
+
+    ccdl = load_ccdl()
+    text = make_manifest(args.packages, load_conditions(args.corpus), args.seed)
+    print(f"{args.packages} packages, {len(text) / 1024:.0f} KB Application.json, best of {args.rounds}\n")
+
+    for targets in (TARGETS[:1], TARGETS):
+        oldTime, oldPeak, oldResult = measure(ccdl, run_old, text, targets, args.rounds)
+        newTime, newPeak, newResult = measure(ccdl, run_new, text, targets, args.rounds)
+        if not same_result(oldResult, newResult):
+            sys.exit(f"{len(targets)} targets: filters keep different data")
+
+        print(f"{len(targets)} target(s)")
+        for name, seconds, peak in (("old filter chain", oldTime, oldPeak), ("matrix filter", newTime, newPeak)):
+            print(f"  {name:<20}{seconds * 1000:>8.2f} ms{peak / 1024:>10.0f} KB peak{oldTime / seconds:>8.1f}x")
@@ -0,0 +1,155 @@
+"""
+Benchmark of package write path: MB/s and CPU% of downloader process.
+
+A local http server (separate process) sends a file, then it is downloaded
+with the old 1 KB iter_content loop, iter_content with large chunks and
+stream_to_file of ccdl-win.py (socket readinto with writer thread).
+
+run: python tools/bench_write.py --size 1024 --chunkSize 1024
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import functools
+import importlib.util
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+from tqdm.auto import tqdm
+
+CCDL_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "ccdl-win.py")
+
+
+def serve(port, size: int) -> None:
+    """Serve size bytes on every GET"""
+    block = memoryview(bytes(1024 * 1024))
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+            remain = size
+            while remain > 0:
+                n = min(remain, len(block))
+                self.wfile.write(block[:n])
+                remain -= n
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    port.value = server.server_address[1]
+    server.serve_forever()
+
+
+def load_ccdl(chunkSize: int, devnull):
+    """Import ccdl-win.py with config needed by stream_to_file"""
+    spec = importlib.util.spec_from_file_location("ccdl", CCDL_PATH)
+    ccdl = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ccdl)
+    ccdl.cfg = {
+        "chunkSize": chunkSize,
+        "limit": 0,
+        "hostLimit": 0,
+        "limitHours": None,
+        "progress": "file",
+    }
+    ccdl.tqdm = functools.partial(tqdm, file=devnull)
+    return ccdl
+
+
+def before(session, url, file, devnull, chunkSize) -> None:
+    """Old loop, 1 KB chunks with progress update for each"""
+    response = session.get(url, stream=True)
+    total = int(response.headers.get("content-length", 0))
+    with tqdm(total=total, unit="iB", unit_scale=True, file=devnull) as pBar:
+        for data in response.iter_content(1024):
+            pBar.update(len(data))
+            file.write(data)
+
+
+def large_chunks(session, url, file, devnull, chunkSize) -> None:
+    """iter_content with large chunks, new bytes for each chunk"""
+    response = session.get(url, stream=True)
+    total = int(response.headers.get("content-length", 0))
+    with tqdm(total=total, unit="iB", unit_scale=True, file=devnull) as pBar:
+        for data in response.iter_content(chunkSize):
+            pBar.update(len(data))
+            file.write(data)
+
+
+def after(ccdl, session, url, file, devnull, chunkSize) -> None:
+    """stream_to_file of ccdl-win.py"""
+    response = session.get(url, stream=True)
+    total = int(response.headers.get("content-length", 0))
+    with ccdl.PackageBar(total) as pBar:
+        ccdl.stream_to_file(response, file, pBar)
+
+
+def measure(name: str, func, url: str, dest: str, size: int, runs: int) -> None:
+    """Print best MB/s and CPU% of runs"""
+    session = requests.Session()
+    results = []
+    for _ in range(runs):
+        with open(dest, "wb") as file:
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            func(session, url, file)
+            file.flush()
+            os.fsync(file.fileno())
+            cpu = time.process_time() - cpu
+            wall = time.perf_counter() - wall
+        if os.path.getsize(dest) != size:
+            sys.exit(f"{name}: incomplete file")
+        results.append((size / wall / 1024 ** 2, cpu / wall * 100))
+
+    speed, cpuPct = max(results)
+    print(f"{name:<24}{speed:>10.1f} MB/s{cpuPct:>10.1f} % CPU")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--size", help="File size in MB", type=int, default=512
+    )
+    parser.add_argument(
+        "--chunkSize", help="Read size in KB for large chunks", type=int, default=1024
+    )
+    parser.add_argument(
+        "--runs", help="Runs of each variant, best one is shown", type=int, default=3
+    )
+    parser.add_argument(
+        "--dest", help="Directory for downloaded file", action="store"
+    )
+    args = parser.parse_args()
+
+    size = args.size * 1024 * 1024
+    chunkSize = args.chunkSize * 1024
+    port = multiprocessing.Value("i", 0)
+    server = multiprocessing.Process(target=serve, args=(port, size), daemon=True)
+    server.start()
+    while not port.value:
+        time.sleep(0.05)
+    url = f"http://127.0.0.1:{port.value}/file"
+
+    devnull = open(os.devnull, "w")
+    ccdl = load_ccdl(chunkSize, devnull)
+
+    print(f"{args.size} MB from {url}, best of {args.runs}\n")
+    with tempfile.TemporaryDirectory(dir=args.dest) as tmpDir:
+        dest = os.path.join(tmpDir, "bench.part")
+        measure("before (1 KB chunks)", lambda s, u, f: before(s, u, f, devnull, chunkSize),
+                url, dest, size, args.runs)
+        measure(f"iter_content {args.chunkSize} KB", lambda s, u, f: large_chunks(s, u, f, devnull, chunkSize),
+                url, dest, size, args.runs)
+        measure("after (stream_to_file)", lambda s, u, f: after(ccdl, s, u, f, devnull, chunkSize),
+                url, dest, size, args.runs)
+
+    server.terminate()